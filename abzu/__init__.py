@@ -5,8 +5,26 @@ __version__ = "0.1"
 __author__ = "Tiago Tresoldi"
 __email__ = "tresoldi@shh.mpg.de"
 
+# Import Python standard libraries
+import importlib
+
 # Build the namespace
-from abzu import kiss
-from abzu.language import Language
+from abzu import instrument, kiss, segments
+from abzu.language import (
+    Language,
+    generate_languages,
+    random_language,
+)
+
+from .textgen import iter_species, random_labels, random_species
+
+# Optional submodules, only imported on first access so that they do not
+# add to the import time of the package
+_LAZY_SUBMODULES = ["concepts", "soundchange", "writers"]
+
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module("abzu." + name)
 
-from .textgen import random_labels, random_species
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
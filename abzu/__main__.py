@@ -11,6 +11,7 @@ Module for command-line execution of Abzu.
 import argparse
 import logging
 import random
+import sys
 
 import abzu
 
@@ -102,12 +103,49 @@ def full_test(args):
     quick_test()
 
 
+def print_language(name, words, stream=None):
+    print("Language: %s" % name, file=stream)
+    for idx, word in enumerate(words):
+        print("  %i:\t%s" % (idx + 1, word), file=stream)
+
+
+def iter_languages(args):
+    """
+    Yields the name and the vocabulary of each language requested.
+    """
+
+    # generate multiple languages, if requested
+    if args.languages:
+        for lang in abzu.generate_languages(
+            args.languages, args.size, seed=args.seed, workers=args.workers
+        ):
+            yield lang.name, lang.vocab
+        return
+
+    yield (
+        abzu.textgen.random_labels(1, args.seed)[0],
+        abzu.kiss.iter_words({}, seed=args.seed, num_words=args.size),
+    )
+
+
 def entry(args):
-    print("Language: %s" % abzu.textgen.random_labels(1, args.seed)[0])
-    for idx, word in enumerate(
-        abzu.kiss.random_words(args.size, param={}, seed=args.seed)
-    ):
-        print("  %i:\t%s" % (idx + 1, word))
+    # human-readable output, the default
+    if args.format == "text":
+        compress = args.gzip or None
+        with abzu.writers.open_output(args.output, compress) as stream:
+            for name, vocab in iter_languages(args):
+                if isinstance(vocab, dict):
+                    vocab = vocab.values()
+                print_language(name, vocab, stream)
+        return
+
+    abzu.writers.write_wordlist(
+        abzu.writers.wordlist_rows(iter_languages(args)),
+        args.output,
+        args.format,
+        compress=args.gzip or None,
+        fields=["ID", "LANGUAGE", "CONCEPT", "FORM"],
+    )
 
 
 def main():
@@ -129,6 +167,45 @@ def main():
         default=10,
         help="The number of words in the vocabulary to be generated. Defaults to 10.",
     )
+    parser.add_argument(
+        "--languages",
+        type=int,
+        help="The number of languages to generate, each with its own seed "
+        "derived from the main one. Defaults to a single language.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of worker processes for generating multiple "
+        "languages. Defaults to 1.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "tsv", "jsonl", "cldf"],
+        default="text",
+        help="The output format. Defaults to `text`.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="The output file. Defaults to the standard output.",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Whether to compress the output with gzip. Defaults to False, "
+        "unless the output file ends in `.gz`.",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="table",
+        choices=["table", "json"],
+        help="Whether to record the time spent in each generation stage, "
+        "printing a summary `table` (the default) or `json` to the standard "
+        "error at the end. Stages run by worker processes are not recorded.",
+    )
     ARGS = parser.parse_args()
 
     # Set the requested logging level (either DEBUG or INFO)
@@ -144,4 +221,18 @@ def main():
     logging.debug("Setting the RNG seed to `%s`", ARGS.seed)
     random.seed(ARGS.seed)
 
-    entry(ARGS)
+    if not ARGS.profile:
+        entry(ARGS)
+        return
+
+    with abzu.instrument.profile() as prof:
+        entry(ARGS)
+
+    if ARGS.profile == "json":
+        print(prof.to_json(), file=sys.stderr)
+    else:
+        print(prof.summary(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
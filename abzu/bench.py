@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+"""
+bench.py
+
+Benchmarks for the generation hot paths of Abzu.
+
+Each benchmark is run for a list of sizes (numbers of words, labels, or
+calls), reporting the best wall time of a number of repetitions, the
+throughput, and the peak memory allocated by Python, as measured by
+`tracemalloc` in an additional, untimed run. The import time of the
+package is measured in a fresh interpreter. Results are emitted as JSON,
+so that runs of different releases can be compared:
+
+    $ python -m abzu.bench --sizes 10 1000 1000000 --output bench.json
+"""
+
+# Import Python standard libraries
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+# Import 3rd party libraries
+import numpy as np
+
+import abzu
+
+# The default sizes of each benchmark
+DEFAULT_SIZES = [10, 1000, 100000]
+
+
+def _random_inventory(rng):
+    """
+    Returns a random inventory, as expected by `random_phonology()`.
+    """
+
+    tables = abzu.kiss.get_tables()
+    pattern = tables.random_syll_pattern(rng)
+    inventory = {"vowels": tables.random_vowel_inv(rng)}
+    (
+        inventory["initials"],
+        inventory["medials"],
+        inventory["finals"],
+    ) = tables.random_cons_inv(pattern, rng)
+
+    return inventory
+
+
+def bench_random_words(size, rng):
+    return lambda: abzu.kiss.random_words(size, {}, seed=rng)
+
+
+def bench_phonotactics(size, rng):
+    phonology = abzu.kiss.Phonology.random({}, rng)
+    words = phonology.sample(size, rng)
+
+    return lambda: [abzu.kiss.apply_basic_phonotactics(w) for w in words]
+
+
+def bench_random_phonology(size, rng):
+    inventory = _random_inventory(rng)
+
+    def run():
+        for _ in range(size):
+            abzu.kiss.random_phonology(inventory, {}, seed=rng)
+
+    return run
+
+
+def bench_random_labels(size, rng):
+    return lambda: abzu.random_labels(size, seed=rng)
+
+
+def bench_random_species(size, rng):
+    return lambda: abzu.random_species(size, seed=rng)
+
+
+# Benchmarks, with the unit of their sizes; each function takes a size
+# and a random generator, returning the callable to time, so that any
+# setup is excluded
+BENCHMARKS = {
+    "random_words": (bench_random_words, "words"),
+    "apply_basic_phonotactics": (bench_phonotactics, "words"),
+    "random_phonology": (bench_random_phonology, "calls"),
+    "random_labels": (bench_random_labels, "labels"),
+    "random_species": (bench_random_species, "labels"),
+}
+
+
+def import_time(repeat=3):
+    """
+    Returns the best wall time, in seconds, for importing the package in a
+    new interpreter, excluding the startup of the interpreter itself.
+    """
+
+    code = (
+        "import time; start = time.perf_counter(); import abzu; "
+        "print(time.perf_counter() - start)"
+    )
+
+    return min(
+        float(subprocess.check_output([sys.executable, "-c", code]))
+        for _ in range(repeat)
+    )
+
+
+def run_benchmark(name, size, repeat=3, seed=None):
+    """
+    Runs a benchmark for a size, returning a dictionary with the results.
+    """
+
+    setup, unit = BENCHMARKS[name]
+    rng = np.random.default_rng(seed)
+
+    # time without `tracemalloc`, which slows down allocations
+    timings = []
+    for _ in range(repeat):
+        func = setup(size, rng)
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    func = setup(size, rng)
+    tracemalloc.start()
+    func()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    seconds = min(timings)
+
+    return {
+        "benchmark": name,
+        "size": size,
+        "unit": unit,
+        "seconds": seconds,
+        "rate": size / seconds if seconds else None,
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmarks(names=None, sizes=None, repeat=3, seed=None):
+    """
+    Runs benchmarks for all sizes, returning the report as a dictionary.
+
+    Parameters
+    ----------
+    names : list of str
+        The names of the benchmarks to run. Defaults to all of them.
+    sizes : list of int
+        The sizes to run each benchmark for. Defaults to `DEFAULT_SIZES`.
+    repeat : int
+        The number of timed runs, of which the best is reported. Defaults
+        to 3.
+    seed : value
+        The seed for the random generators. Defaults to None.
+
+    Returns
+    -------
+    report : dict
+        The report, with information on the environment, the import time,
+        and a list of the results of each benchmark and size.
+    """
+
+    names = names or list(BENCHMARKS)
+    sizes = sizes or DEFAULT_SIZES
+
+    # warm up, loading the resources and filling caches
+    for name in names:
+        run_benchmark(name, 1, repeat=1, seed=seed)
+
+    return {
+        "abzu": abzu.__version__,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "import_time": import_time(repeat),
+        "results": [
+            run_benchmark(name, size, repeat, seed)
+            for name in names
+            for size in sizes
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Abzu benchmarks.")
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        metavar="BENCHMARK",
+        help="The benchmarks to run, among %s. Defaults to all."
+        % ", ".join(BENCHMARKS),
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="The sizes to run each benchmark for. Defaults to %s."
+        % " ".join([str(size) for size in DEFAULT_SIZES]),
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="The number of timed runs for each size. Defaults to 3.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="The RNG seed. Defaults to None.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="The JSON output file. Defaults to the standard output.",
+    )
+    args = parser.parse_args()
+
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error("unknown benchmarks: %s" % ", ".join(sorted(unknown)))
+
+    report = run_benchmarks(
+        args.benchmarks, args.sizes, args.repeat, args.seed
+    )
+
+    with abzu.writers.open_output(args.output) as stream:
+        json.dump(report, stream, indent=2)
+        stream.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# encoding: utf-8
+
+"""
+Module with the concept graph of colexifications.
+
+Concepts are identified by the integer IDs of `glosses.tsv`, and the
+weighted colexifications of `colexifications.tsv` are indexed as an
+undirected graph in compressed sparse row (CSR) form, so that the
+neighbours of a concept are a contiguous slice of flat arrays.
+"""
+
+# Import 3rd party libraries
+import numpy as np
+
+# Import other modules
+import abzu.utils
+
+
+class ConceptGraph:
+    """
+    Index of the concepts and of their weighted colexifications.
+
+    Concept IDs are mapped to the rows `0..n-1`, in the order of their IDs;
+    the neighbours of the concept in row `i` are the rows in
+    `indices[indptr[i]:indptr[i + 1]]`, with the colexification
+    frequencies in the same slice of `weights`.
+    """
+
+    def __init__(self, glosses, edges):
+        """
+        Builds the index from glosses and edges.
+
+        Parameters
+        ----------
+        glosses : dict
+            A dictionary of concept IDs (as integers) to glosses.
+        edges : list of tuples
+            The colexifications, as triples of two concept IDs and the
+            frequency of their colexification.
+        """
+
+        self.ids = np.array(sorted(glosses), dtype=np.int32)
+        self.glosses = [glosses[concept_id] for concept_id in self.ids]
+        self._rows = {
+            concept_id: row for row, concept_id in enumerate(self.ids)
+        }
+        self._gloss_rows = {
+            gloss: row for row, gloss in enumerate(self.glosses)
+        }
+
+        # add both directions of every edge, sorting by source and then
+        # by decreasing weight, so that the strongest neighbours come first
+        sources = [self._rows[id_a] for id_a, id_b, _ in edges]
+        targets = [self._rows[id_b] for id_a, id_b, _ in edges]
+        weights = [weight for _, _, weight in edges]
+        sources, targets = sources + targets, targets + sources
+        weights = np.array(weights + weights, dtype=np.float64)
+        order = np.lexsort((-weights, sources))
+
+        self.indices = np.array(targets, dtype=np.int32)[order]
+        self.weights = weights[order]
+        self.indptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(sources, minlength=len(self.ids)),
+            out=self.indptr[1:],
+        )
+
+    @classmethod
+    def from_files(cls, glosses_file, colex_file):
+        """
+        Builds the index from the resource files.
+        """
+
+        glosses = {
+            int(concept_id): row["GLOSS"]
+            for concept_id, row in abzu.utils.read_data(glosses_file).items()
+        }
+        gloss_ids = {
+            gloss: concept_id for concept_id, gloss in glosses.items()
+        }
+
+        edges = [
+            (
+                gloss_ids[row["CONCEPT_A"]],
+                gloss_ids[row["CONCEPT_B"]],
+                float(row["FREQUENCY"]),
+            )
+            for row in abzu.utils.read_data(colex_file).values()
+        ]
+
+        return cls(glosses, edges)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, concept):
+        return concept in self._rows or concept in self._gloss_rows
+
+    def row(self, concept):
+        """
+        Returns the row of a concept, given by its ID or by its gloss.
+        """
+
+        if isinstance(concept, str):
+            return self._gloss_rows[concept]
+
+        return self._rows[concept]
+
+    def neighbours(self, concept):
+        """
+        Returns the IDs and weights of the concepts colexified with another.
+
+        Neighbours are sorted by decreasing weight; both arrays are views of
+        the index and should not be modified.
+        """
+
+        row = self.row(concept)
+        start, end = self.indptr[row], self.indptr[row + 1]
+
+        return self.ids[self.indices[start:end]], self.weights[start:end]
+
+    def colexify(self, rows, rng=np.random):
+        """
+        Draws the colexifications among a sequence of concept rows.
+
+        Each edge between two concepts in `rows` is realized with its
+        colexification frequency as probability; a concept then takes the
+        word of the earlier concept it is most strongly colexified with,
+        following chains, so that the words of colexified concepts are
+        shared.
+
+        Parameters
+        ----------
+        rows : list of int
+            The rows of the concepts, in the order in which their words
+            are assigned.
+        rng : numpy.random.Generator
+            The random number generator to use. Defaults to the global one.
+
+        Returns
+        -------
+        sources : numpy.ndarray
+            For each position in `rows`, the position of the concept whose
+            word it takes, which is the position itself if the concept is
+            not colexified.
+        """
+
+        rows = np.asarray(rows, dtype=np.int64)
+        sources = np.arange(len(rows))
+        if not len(rows):
+            return sources
+
+        # map the rows to their positions, keeping only the first
+        # occurrence of each concept
+        position = np.full(len(self.ids), -1, dtype=np.int64)
+        position[rows[::-1]] = np.arange(len(rows))[::-1]
+
+        # collect all edges to earlier concepts in the sequence, still
+        # sorted by position and by decreasing weight
+        counts = self.indptr[rows + 1] - self.indptr[rows]
+        edges = np.repeat(
+            self.indptr[rows] - np.cumsum(counts) + counts, counts
+        )
+        edges += np.arange(counts.sum())
+        edge_pos = np.repeat(np.arange(len(rows)), counts)
+        target_pos = position[self.indices[edges]]
+        earlier = (target_pos >= 0) & (target_pos < edge_pos)
+
+        edges, edge_pos = edges[earlier], edge_pos[earlier]
+        target_pos = target_pos[earlier]
+        hits = rng.random(len(edges)) < self.weights[edges]
+
+        # the first edge realized for each position has the highest weight
+        edge_pos, first = np.unique(edge_pos[hits], return_index=True)
+        sources[edge_pos] = target_pos[hits][first]
+
+        # positions are resolved in order, so that chains point to their
+        # first concept
+        for pos in edge_pos:
+            sources[pos] = sources[sources[pos]]
+
+        return sources
+
+
+# The default graph is built from the resource files once, and cached as
+# a snapshot along with the other resources
+abzu.utils.RESOURCES.register(
+    "concept_graph",
+    ("glosses.tsv", "colexifications.tsv"),
+    build=ConceptGraph.from_files,
+)
+
+
+def get_concept_graph():
+    """
+    Returns the default concept graph, loading it on first use.
+    """
+
+    return abzu.utils.RESOURCES["concept_graph"]
@@ -0,0 +1,198 @@
+# encoding: utf-8
+
+"""
+Module with opt-in timing instrumentation for the generation stages.
+
+Functions are marked as stages with the `stage()` decorator, and parts of
+functions with the `section()` context manager. Nothing is recorded unless
+a `profile()` context is active, in which case the wall time, number of
+calls, and number of items (such as words) processed by each stage are
+accumulated; when disabled, the overhead is a single check of a global.
+Stages run in worker processes are not recorded.
+
+    >>> with abzu.instrument.profile() as prof:
+    ...     words = abzu.kiss.random_words(1000, {})
+    >>> print(prof.summary())
+"""
+
+# Import Python standard libraries
+import contextlib
+import functools
+import json
+import time
+
+# The active profile, if any
+_PROFILE = None
+
+# Context manager returned by `section()` when no profile is active
+_NULL_SECTION = contextlib.nullcontext()
+
+
+class Profile:
+    """
+    Accumulator for the wall time, calls, and items of each stage.
+
+    Times are inclusive, so that the time of a stage includes that of the
+    stages it calls.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, name, seconds, items=0):
+        """
+        Records a call to a stage.
+        """
+
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [1, seconds, items]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += items
+
+    def merge(self, other):
+        """
+        Adds the records of another profile to this one.
+        """
+
+        for name, (calls, seconds, items) in other.stages.items():
+            entry = self.stages.setdefault(name, [0, 0.0, 0])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += items
+
+    def as_dict(self):
+        """
+        Returns the records as a dictionary, sorted by decreasing time.
+        """
+
+        return {
+            name: {"calls": calls, "seconds": seconds, "items": items}
+            for name, (calls, seconds, items) in sorted(
+                self.stages.items(), key=lambda entry: -entry[1][1]
+            )
+        }
+
+    def to_json(self):
+        """
+        Returns the records as a JSON string.
+        """
+
+        return json.dumps(self.as_dict(), indent=2)
+
+    def summary(self):
+        """
+        Returns the records as a table, sorted by decreasing time.
+        """
+
+        stats = self.as_dict()
+        width = max([len("stage")] + [len(name) for name in stats])
+
+        lines = [
+            "%-*s %10s %12s %12s %12s"
+            % (width, "stage", "calls", "seconds", "items", "items/sec")
+        ]
+        for name, entry in stats.items():
+            rate = entry["items"] / entry["seconds"] if entry["seconds"] else 0
+            lines.append(
+                "%-*s %10i %12.4f %12i %12.1f"
+                % (
+                    width,
+                    name,
+                    entry["calls"],
+                    entry["seconds"],
+                    entry["items"],
+                    rate,
+                )
+            )
+
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile():
+    """
+    Records all stages run within the context, yielding the `Profile`.
+
+    Nested profiles are also added to the enclosing one.
+    """
+
+    global _PROFILE
+
+    previous, _PROFILE = _PROFILE, Profile()
+    try:
+        yield _PROFILE
+    finally:
+        current, _PROFILE = _PROFILE, previous
+        if previous is not None:
+            previous.merge(current)
+
+
+def stage(name, count=None):
+    """
+    Decorator marking a function as a stage.
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage in the records.
+    count : callable
+        An optional function returning the number of items processed from
+        the value returned by the decorated function, such as `len`.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _PROFILE is None:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            _PROFILE.add(
+                name,
+                time.perf_counter() - start,
+                count(result) if count else 0,
+            )
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class _Section:
+    """
+    Context manager recording the time of a section as a stage.
+    """
+
+    __slots__ = ("profile", "name", "items", "start")
+
+    def __init__(self, profile, name, items):
+        self.profile = profile
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(
+            self.name, time.perf_counter() - self.start, self.items
+        )
+
+
+def section(name, items=0):
+    """
+    Returns a context manager recording a part of a function as a stage.
+    """
+
+    if _PROFILE is None:
+        return _NULL_SECTION
+
+    return _Section(_PROFILE, name, items)
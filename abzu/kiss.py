@@ -7,109 +7,278 @@ Intended as a "Keep It Simple, Stupid" version.
 """
 
 # Import Python standard libraries
-import csv
-from hashlib import sha256
-import numpy as np
-from os import path
+import functools
 import re
+import unicodedata
+
+# Import 3rd party libraries
+import numpy as np
 
+import abzu.instrument
+import abzu.segments
 import abzu.utils
+from abzu.utils import read_data
+
+# Map the names of the legacy module-level data tables to the resources
+# in the registry, which are only loaded on first access
+_RESOURCE_NAMES = {
+    "VOWEL_INV": "vowel_inventories",
+    "SYLL_PATTERN": "syllable_patterns",
+    "CONS_INV": "consonant_inventories",
+    "PHONEME_FREQ": "phoneme_frequency",
+}
+
+# The largest number of unique words tracked with an exact set by
+# `iter_words()`; larger runs use a Bloom filter of fixed size
+UNIQUE_SET_LIMIT = 1000000
 
-# TODO: move _RESOURCE_DIR and reading to a utils.py module
 
-# Set the resource directory; this is sage as we already added
-# `zip_safe=False` to setup.py
-_RESOURCE_DIR = path.join(path.dirname(path.dirname(__file__)), "resources")
+def __getattr__(name):
+    if name in _RESOURCE_NAMES:
+        return abzu.utils.RESOURCES[_RESOURCE_NAMES[name]]
 
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
-def read_data(filename):
-    filename = path.join(_RESOURCE_DIR, filename)
 
-    with open(filename) as csvfile:
-        data = {row.pop("ID"): row for row in csv.DictReader(csvfile, delimiter="\t")}
+def _cdf(weights):
+    """
+    Returns the normalized cumulative distribution of a list of weights.
+
+    The table is computed just like `numpy.random.choice()` does, so that
+    `cdf.searchsorted(uniform, side="right")` returns the very same index
+    for the same uniform draw.
+    """
 
-    return data
+    cdf = np.cumsum(np.asarray(weights, dtype=float))
+    cdf /= cdf[-1]
 
+    return cdf
 
-VOWEL_INV = read_data("vowel_inventories.tsv")
-SYLL_PATTERN = read_data("syllable_patterns.tsv")
-CONS_INV = read_data("consonant_inventories.tsv")
-PHONEME_FREQ = read_data("phoneme_frequency.tsv")
 
+def _normalize(weights):
+    """
+    Returns a list of weights normalized so that they sum to one.
+    """
 
+    weight_sum = sum(weights)
+
+    return [weight / weight_sum for weight in weights]
+
+
+def _draw(cdf, size, rng=np.random):
+    """
+    Draws `size` random indexes from a cumulative distribution.
+    """
+
+    return cdf.searchsorted(rng.random(size), side="right")
+
+
+class AliasSampler:
+    """
+    Sampler for a discrete distribution, using Walker's alias method.
 
+    The distribution is compiled once, with Vose's algorithm, into a table
+    of acceptance probabilities and aliases, so that each sample costs a
+    single uniform draw and a comparison, regardless of the number of
+    outcomes. Samples are indexes into the list of weights.
+    """
+
+    __slots__ = ("size", "prob", "alias", "_prob", "_alias")
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=float)
+        if not len(weights) or weights.sum() <= 0:
+            raise ValueError("Weights must be non-empty and sum above zero")
+
+        self.size = len(weights)
+        scaled = weights * self.size / weights.sum()
+        self.prob = np.ones(self.size)
+        self.alias = np.arange(self.size)
+
+        # pair each outcome below the mean with one above it, which gives
+        # away the probability mass the former lacks
+        small = [idx for idx, value in enumerate(scaled) if value < 1.0]
+        large = [idx for idx, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+        # lists for scalar draws, which are faster than indexing arrays
+        self._prob = self.prob.tolist()
+        self._alias = self.alias.tolist()
+
+    def __len__(self):
+        return self.size
+
+    def draw(self, size=None, rng=np.random):
+        """
+        Draws an index or, if `size` is given, an array of indexes.
+        """
+
+        # the integer part of the scaled uniform selects the column, and
+        # the fractional part decides between it and its alias
+        if size is None:
+            value = rng.random() * self.size
+            idx = min(int(value), self.size - 1)
+            if value - idx < self._prob[idx]:
+                return idx
+            return self._alias[idx]
+
+        values = rng.random(size) * self.size
+        idx = np.minimum(values.astype(np.intp), self.size - 1)
+
+        return np.where(values - idx < self.prob[idx], idx, self.alias[idx])
+
+
+class PhonotacticTables:
+    """
+    Precomputed sampling tables for inventories and syllable patterns.
+
+    Vowel inventories and syllable patterns are stored along with the
+    cumulative distribution of their weights, and consonant inventories
+    are indexed by syllable pattern, so that each draw is a single binary
+    search. The tables follow the order and normalization used with
+    `numpy.random.choice()` over the resources sorted by ID, so that the
+    seeded draws are the same.
+    """
+
+    def __init__(self, vowel_inv, syll_pattern, cons_inv):
+        inv_ids = sorted(vowel_inv)
+        self.vowel_inventories = [
+            tuple(vowel_inv[inv_id]["VOWELS"].split("|")) for inv_id in inv_ids
+        ]
+        self.vowel_cdf = _cdf(
+            _normalize(
+                [float(vowel_inv[inv_id]["FREQUENCY"]) for inv_id in inv_ids]
+            )
+        )
+
+        pids = sorted(syll_pattern)
+        self.patterns = [syll_pattern[pid]["PATTERN"] for pid in pids]
+        self.pattern_cdf = _cdf(
+            _normalize([float(syll_pattern[pid]["FREQUENCY"]) for pid in pids])
+        )
+
+        # index the consonant inventories by pattern, making sure there are
+        # no empty strings in case of empty lists
+        self.cons_inventories = {}
+        for inv_id in sorted(cons_inv):
+            entry = cons_inv[inv_id]
+            self.cons_inventories.setdefault(entry["PATTERN"], []).append(
+                tuple(
+                    tuple(sound for sound in entry[slot].split("|") if sound)
+                    for slot in ["INITIAL", "MEDIAL", "FINAL"]
+                )
+            )
+
+    @classmethod
+    def from_resources(cls, registry=None):
+        """
+        Builds the tables from the resources of a registry.
+
+        The default registry, `abzu.utils.RESOURCES`, is used if none is
+        provided.
+        """
+
+        if not registry:
+            registry = abzu.utils.RESOURCES
+
+        return cls(
+            registry["vowel_inventories"],
+            registry["syllable_patterns"],
+            registry["consonant_inventories"],
+        )
+
+    def random_vowel_inv(self, rng=np.random):
+        """
+        Returns a random vowel inventory, as a list of vowels.
+        """
+
+        return list(self.vowel_inventories[_draw(self.vowel_cdf, 1, rng)[0]])
+
+    def random_syll_pattern(self, rng=np.random):
+        """
+        Returns a random syllable pattern.
+        """
+
+        return self.patterns[_draw(self.pattern_cdf, 1, rng)[0]]
+
+    def random_cons_inv(self, pattern, rng=np.random):
+        """
+        Returns a random consonant inventory for a syllable pattern.
+
+        The inventory is returned as lists of initials, medials, and finals.
+        """
+
+        inventories = self.cons_inventories[pattern]
+        idx = rng.choice(len(inventories), size=1)[0]
+
+        return [list(sounds) for sounds in inventories[idx]]
+
+
+@functools.lru_cache(maxsize=None)
+def get_tables():
+    """
+    Returns the phonotactic tables of the default resources.
+
+    The tables are built on first call and shared by the whole process.
+    """
+
+    return PhonotacticTables.from_resources()
+
+
+@abzu.instrument.stage("kiss.random_vowel_inv")
 def random_vowel_inv(distr=None, seed=None):
     """
     Returns a random vowel inventory.
 
     This does not include probabilities for weighted random draws inside
-    the inventory.
+    the inventory. If no distribution is given, the inventory is drawn
+    from the precomputed tables of `get_tables()`.
     """
 
-    # if no distribution of inventories/weights is given, build one
-    # from abzu_data
-    if not distr:
-        # initialize an empty distribution
-        distr = {}
-
-        # TODO: properly split with zip
-        # TODO: rename frequency to weight
-        # copy the inventories as a `pop`ulation
-        distr["pop"] = [
-            VOWEL_INV[inv_id]["VOWELS"] for inv_id in sorted(VOWEL_INV)
-        ]
+    rng = abzu.utils.get_rng(seed)
 
-        # get the ratio and copy the frequencies as `weights`
-        weights = [
-            float(VOWEL_INV[inv_id]["FREQUENCY"])
-            for inv_id in sorted(VOWEL_INV)
-        ]
-        weight_sum = sum(weights)
-        distr["weights"] = [w / weight_sum for w in weights]
+    # if no distribution of inventories/weights is given, use the tables
+    # built from abzu_data
+    if not distr:
+        return get_tables().random_vowel_inv(rng)
 
     # get a random weighted individual
-    abzu.utils.seed_rngs(seed)
-    vowel_inv = np.random.choice(distr["pop"], p=distr["weights"], size=1)[0]
+    vowel_inv = rng.choice(distr["pop"], p=distr["weights"], size=1)[0]
 
     return vowel_inv.split("|")
 
 
+@abzu.instrument.stage("kiss.random_syll_pattern")
 def random_syll_pattern(distr=None, seed=None):
     """
     Returns a random syllable pattern.
-    """
-
-    # if no distribution of inventories/weights is given, build one
-    # from abzu_data
-    if not distr:
-        # initialize an empty distribution
-        distr = {}
 
-        # TODO: properly split with zip
-        # TODO: rename frequency to weight
+    If no distribution is given, the pattern is drawn from the precomputed
+    tables of `get_tables()`.
+    """
 
-        # copy the patterns as a `pop`ulation
-        distr["pop"] = [
-            SYLL_PATTERN[pid]["PATTERN"] for pid in sorted(SYLL_PATTERN)
-        ]
-        # distr["pop"] = [entry["PATTERN"] for entry in SYLL_PATTERN.values()]
+    rng = abzu.utils.get_rng(seed)
 
-        # get the ratio and copy the frequencies as `weights`
-        weights = [
-            float(SYLL_PATTERN[pid]["FREQUENCY"])
-            for pid in sorted(SYLL_PATTERN)
-        ]
-        # weights = [int(entry["FREQUENCY"]) for entry in SYLL_PATTERN.values()]
-        weight_sum = sum(weights)
-        distr["weights"] = [w / weight_sum for w in weights]
+    # if no distribution of inventories/weights is given, use the tables
+    # built from abzu_data
+    if not distr:
+        return get_tables().random_syll_pattern(rng)
 
     # get a random weighted individual
-    abzu.utils.seed_rngs(seed)
-    pat = np.random.choice(distr["pop"], p=distr["weights"], size=1)[0]
+    pat = rng.choice(distr["pop"], p=distr["weights"], size=1)[0]
 
     return pat
 
 
+@abzu.instrument.stage("kiss.random_cons_inv")
 def random_cons_inv(distr, seed=None):
     """
     Returns a random consonant inventory from a list of possibilities.
@@ -128,9 +297,9 @@ def random_cons_inv(distr, seed=None):
         for distr_id in sorted(distr)
     ]
 
-    abzu.utils.seed_rngs(seed)
+    rng = abzu.utils.get_rng(seed)
     initials, medials, finals = distr_list[
-        np.random.choice(len(distr_list), size=1)[0]
+        rng.choice(len(distr_list), size=1)[0]
     ]
 
     # Split the lists of phonemes, making sure there are no empty strings
@@ -142,22 +311,208 @@ def random_cons_inv(distr, seed=None):
     return initials, medials, finals
 
 
+class FrequencyTable:
+    """
+    Base frequencies of graphemes, stored in an array.
+
+    Graphemes are mapped to their positions in the array, whose last entry
+    holds the default frequency for missing graphemes, the mean frequency
+    divided by 1.5, so that the frequencies of any list of graphemes are
+    obtained with a single indexing operation.
+
+    Unless built with `resolve=False`, which only matches graphemes
+    verbatim as in the legacy generation, graphemes are matched after
+    Unicode (NFD) normalization, and clusters of space-separated segments,
+    as used by the inventories, are resolved to the frequency of their
+    unspaced form, if listed, or else to the product of the frequencies
+    of their segments. The graphemes of the inventories in the resources
+    are all resolved when the table is built, so that each lookup is a
+    single dictionary access, and any other grapheme is resolved on first
+    lookup.
+    """
+
+    def __init__(self, base_freq, resolve=True, graphemes=()):
+        self.resolve = resolve
+        self.index = {grapheme: idx for idx, grapheme in enumerate(base_freq)}
+        self._freqs = list(base_freq.values())
+        self.default = np.mean(self._freqs) / 1.5
+
+        # the default, followed by the graphemes resolved so far
+        self._freqs.append(self.default)
+        self._missing = len(self._freqs) - 1
+        if resolve:
+            self._normalized = {
+                unicodedata.normalize("NFD", grapheme): freq
+                for grapheme, freq in base_freq.items()
+            }
+            for grapheme in graphemes:
+                self._resolve(grapheme)
+
+        self.freqs = np.array(self._freqs, dtype=float)
+
+    @classmethod
+    def from_resources(cls, registry=None, resolve=True):
+        """
+        Builds the table from the `phoneme_frequency` resource.
+
+        If `resolve` is set, the graphemes and clusters of the vowel and
+        consonant inventories are resolved in advance.
+        """
+
+        if not registry:
+            registry = abzu.utils.RESOURCES
+
+        graphemes = set()
+        if resolve:
+            for entry in registry["vowel_inventories"].values():
+                graphemes.update(entry["VOWELS"].split("|"))
+            for entry in registry["consonant_inventories"].values():
+                for slot in ["INITIAL", "MEDIAL", "FINAL"]:
+                    graphemes.update(entry[slot].split("|"))
+            graphemes.discard("")
+
+        return cls(
+            {
+                entry["GRAPHEME"]: float(entry["FREQUENCY"])
+                for entry in registry["phoneme_frequency"].values()
+            },
+            resolve,
+            sorted(graphemes),
+        )
+
+    def _resolve(self, grapheme):
+        """
+        Adds a grapheme to the index, returning its position.
+        """
+
+        normalized = unicodedata.normalize("NFD", grapheme)
+        freq = self._normalized.get(normalized.replace(" ", ""))
+        if freq is None:
+            segments = normalized.split()
+            if len(segments) > 1:
+                freq = float(
+                    np.prod(
+                        [
+                            self._normalized.get(segment, self.default)
+                            for segment in segments
+                        ]
+                    )
+                )
+            else:
+                freq = self.default
+
+        self._freqs.append(freq)
+        self.index[grapheme] = len(self._freqs) - 1
+
+        return self.index[grapheme]
+
+    def lookup(self, graphemes):
+        """
+        Returns an array with the frequencies of a list of graphemes.
+        """
+
+        index = self.index
+        if not self.resolve:
+            return self.freqs[
+                [index.get(grapheme, self._missing) for grapheme in graphemes]
+            ]
+
+        idx = [index.get(grapheme) for grapheme in graphemes]
+        if None in idx:
+            idx = [
+                self._resolve(grapheme) if pos is None else pos
+                for pos, grapheme in zip(idx, graphemes)
+            ]
+            self.freqs = np.array(self._freqs, dtype=float)
+
+        return self.freqs[idx]
+
+
+@functools.lru_cache(maxsize=None)
+def get_frequency_table(resolve=True):
+    """
+    Returns the frequency table built from the resources, building it once.
+
+    Tables built with `resolve=False` reproduce the frequencies of the
+    legacy generation, where clusters always take the default frequency.
+    """
+
+    return FrequencyTable.from_resources(resolve=resolve)
+
+
+@abzu.instrument.stage("kiss.random_phonology")
 def random_phonology(inventory, param, base_freq=None, seed=None):
     """
     Returns consonant and vowel inventories with random frequencies.
+
+    Parameters
+    ----------
+    inventory : dict
+        The lists of `"vowels"`, `"initials"`, `"medials"`, and `"finals"`.
+    param : dict
+        A dictionary of parameters; missing ones are set to their default
+        values.
+    base_freq : dict or FrequencyTable
+        The base frequencies of the graphemes. Defaults to the frequencies
+        from the resources.
+    seed : value
+        An optional seed for the random number generators, or a
+        `numpy.random.Generator` to draw from. Defaults to None.
+
+    Returns
+    -------
+    phonology : dict
+        A dictionary with the four slot classes, each mapping graphemes to
+        their probabilities.
+    """
+
+    return random_phonologies([inventory], param, base_freq, seed)[0]
+
+
+@abzu.instrument.stage("kiss.random_phonologies", count=len)
+def random_phonologies(inventories, param, base_freq=None, seed=None):
+    """
+    Returns random frequencies for the inventories of many languages.
+
+    The graphemes of all slots of all inventories are handled as a single
+    batch: their base frequencies are looked up at once, all perturbation
+    exponents are drawn in one call, and the frequencies are normalized
+    per slot with a single grouped sum. The random values are consumed in
+    the same order as by successive calls to `random_phonology()`, which
+    returns the same results.
+
+    Parameters
+    ----------
+    inventories : list of dict
+        The inventories, as expected by `random_phonology()`.
+    param : dict
+        A dictionary of parameters; missing ones are set to their default
+        values.
+    base_freq : dict or FrequencyTable
+        The base frequencies of the graphemes. Defaults to the frequencies
+        from the resources.
+    seed : value
+        An optional seed for the random number generators, or a
+        `numpy.random.Generator` to draw from. Defaults to None.
+
+    Returns
+    -------
+    phonologies : list of dict
+        The phonology of each inventory, as returned by
+        `random_phonology()`.
     """
 
     # set seed
-    abzu.utils.seed_rngs(seed)
+    rng = abzu.utils.get_rng(seed)
 
     # load parameters
     perturbation = param.get("perturbation", 1.5)
 
     # load the base frequency, if it was not provided
     if not base_freq:
-        base_freq = {
-            v["GRAPHEME"]: float(v["FREQUENCY"]) for v in PHONEME_FREQ.values()
-        }
+        base_freq = get_frequency_table()
+    elif not isinstance(base_freq, FrequencyTable):
+        base_freq = FrequencyTable(base_freq)
 
     # the perturbation is basically done by selecting a random number in
     # the requested range, for which we compute the lower and upper bound,
@@ -166,99 +521,70 @@ def random_phonology(inventory, param, base_freq=None, seed=None):
     perturb_low = 1.0 - (perturbation / 2.0)
     perturb_high = 1.0 + (perturbation / 2.0)
 
-    # get the mean frequency divided by 1.5, so we have something to default
-    # in case of missing graphemes (especially clusters)
-    # TODO: this is applying to all clusters right now, as we have a space
-    #       between the graphemes in abzu_data but not in phoible
-    default_freq = np.mean(list(base_freq.values())) / 1.5
-
-    # compute random frequencies
-    vowels = {
-        vowel: base_freq.get(vowel, default_freq)
-        ** np.random.uniform(low=perturb_low, high=perturb_high)
-        for vowel in sorted(inventory["vowels"])
-    }
-
-    initials = {
-        cons: base_freq.get(cons, default_freq)
-        ** np.random.uniform(low=perturb_low, high=perturb_high)
-        for cons in sorted(inventory["initials"])
-    }
-
-    medials = {
-        cons: base_freq.get(cons, default_freq)
-        ** np.random.uniform(low=perturb_low, high=perturb_high)
-        for cons in sorted(inventory["medials"])
-    }
-
-    finals = {
-        cons: base_freq.get(cons, default_freq)
-        ** np.random.uniform(low=perturb_low, high=perturb_high)
-        for cons in sorted(inventory["finals"])
-    }
-
-    # correct the new probabilities, so they sum 1.0
-    new_inventory = {}
-    new_inventory["vowels"] = {
-        k: v / sum(vowels.values()) for k, v in vowels.items()
-    }
-    new_inventory["initials"] = {
-        k: v / sum(initials.values()) for k, v in initials.items()
-    }
-    new_inventory["medials"] = {
-        k: v / sum(medials.values()) for k, v in medials.items()
-    }
-    new_inventory["finals"] = {
-        k: v / sum(finals.values()) for k, v in finals.items()
-    }
-
-    return new_inventory
-
-
-def random_words(num_words, param, seed=None):
-    # set the seed
-    abzu.utils.seed_rngs(seed)
+    # collect the graphemes of all slots, in order, along with the number
+    # of graphemes in each slot
+    keys = [
+        sorted(inventory[slot])
+        for inventory in inventories
+        for slot in Phonology.SLOTS
+    ]
+    graphemes = [grapheme for slot_keys in keys for grapheme in slot_keys]
+    sizes = [len(slot_keys) for slot_keys in keys]
+
+    # compute random frequencies and correct them, so they sum 1.0
+    freqs = base_freq.lookup(graphemes) ** rng.uniform(
+        low=perturb_low, high=perturb_high, size=len(graphemes)
+    )
+    slot_idx = np.repeat(np.arange(len(sizes)), sizes)
+    freqs /= np.bincount(slot_idx, weights=freqs, minlength=len(sizes))[
+        slot_idx
+    ]
+
+    # build the dictionaries, in the order of `Phonology.SLOTS`
+    freqs = freqs.tolist()
+    phonologies = []
+    start = 0
+    for lang_idx in range(len(inventories)):
+        phonology = {}
+        for slot_idx, slot in enumerate(Phonology.SLOTS):
+            slot_keys = keys[lang_idx * len(Phonology.SLOTS) + slot_idx]
+            end = start + len(slot_keys)
+            phonology[slot] = dict(zip(slot_keys, freqs[start:end]))
+            start = end
+        phonologies.append(phonology)
+
+    return phonologies
+
+
+@abzu.instrument.stage("kiss.random_words.legacy", count=len)
+def _random_words_legacy(num_words, phonology, no_consonant, param, rng):
+    """
+    Generates words with one scalar RNG call per decision and phoneme.
+
+    This is the original word generation loop, kept so that the seeded
+    output of earlier versions can be reproduced (see the `legacy`
+    argument of `random_words()`).
+    """
 
-    # get parameters as specified or default
-    # TODO: default `no_consonant` should depend on the system entropy
-    no_cons_low = param.get("no_cons_low", 0.33)
-    no_cons_high = param.get("no_cons_high", 0.66)
     base_syl_lambda = param.get("base_syl_lambda", 10)
     remove_length = param.get("remove_length", 0.33)
 
-    # get the 'phonotactics' of the language
-    pattern = random_syll_pattern()
-    inv = {}
-    inv["vowels"] = random_vowel_inv()
-    cons_distr = {
-        key: value
-        for key, value in CONS_INV.items()
-        if value["PATTERN"] == pattern
-    }
-    inv["initials"], inv["medials"], inv["finals"] = random_cons_inv(cons_distr)
-    phonology = random_phonology(inv, param)
-    no_consonant = np.random.uniform(low=no_cons_low, high=no_cons_high)
-
     # cache keys/values/lengths
     v_keys = sorted(phonology["vowels"])
     v_values = [phonology["vowels"][vowel] for vowel in v_keys]
     v_len = len(v_keys)
-    v_range = list(range(len(v_keys)))
 
     i_keys = sorted(phonology["initials"])
     i_values = [phonology["initials"][initial] for initial in i_keys]
     i_len = len(i_keys)
-    i_range = list(range(len(i_keys)))
 
     m_keys = sorted(phonology["medials"])
     m_values = [phonology["medials"][medial] for medial in m_keys]
     m_len = len(m_keys)
-    m_range = list(range(len(m_keys)))
 
     f_keys = sorted(phonology["finals"])
     f_values = [phonology["finals"][final] for final in f_keys]
     f_len = len(f_keys)
-    f_range = list(range(len(f_keys)))
 
     # generate all words
     words = []
@@ -268,7 +594,7 @@ def random_words(num_words, param, seed=None):
         # simpler phonotactics will tend to have more syllables; we also
         # currently restrict to at most 5 syllables
         syl_lambda = base_syl_lambda / np.sqrt(v_len + m_len)
-        num_syl = min(np.random.poisson(syl_lambda) + 1, 5)
+        num_syl = min(rng.poisson(syl_lambda) + 1, 5)
 
         # if we got a single syllable, increase it with another one 66% of the
         # time -- not very chinese like
@@ -277,29 +603,29 @@ def random_words(num_words, param, seed=None):
         #       but one whose shape is closer to a gamma one, with many other
         #       factors involved (such as size of inventory)
         if num_syl == 1:
-            if np.random.random() < 0.66:
+            if rng.random() < 0.66:
                 num_syl = 2
 
         syl_sounds = []
         for syl in range(num_syl):
             # get a random initial or medial (or nothing)
-            if np.random.random() < no_consonant:
+            if rng.random() < no_consonant:
                 if syl == 0:
-                    _ = np.random.choice(i_len, p=i_values)
+                    _ = rng.choice(i_len, p=i_values)
                     syl_sounds.append(i_keys[_])
                 else:
-                    _ = np.random.choice(m_len, p=m_values)
+                    _ = rng.choice(m_len, p=m_values)
                     syl_sounds.append(m_keys[_])
 
             # get a random vowel
-            _ = np.random.choice(v_len, p=v_values)
+            _ = rng.choice(v_len, p=v_values)
             syl_sounds.append(v_keys[_])
 
             # get a random final (or not) if at last syllable and if
             # finals are used
             if syl == num_syl - 1 and f_len:
-                if np.random.random() < no_consonant:
-                    _ = np.random.choice(f_len, p=f_values)
+                if rng.random() < no_consonant:
+                    _ = rng.choice(f_len, p=f_values)
                     syl_sounds.append(f_keys[_])
 
         # collect
@@ -309,70 +635,817 @@ def random_words(num_words, param, seed=None):
     words = [apply_basic_phonotactics(word) for word in words]
 
     # remove all length symbols by random decision
-    if np.random.random() < remove_length:
+    if rng.random() < remove_length:
         words = [word.replace("ː", "") for word in words]
 
     return words
 
 
+@abzu.instrument.stage("kiss.random_inventory")
+def _random_inventory(param, rng, legacy=False):
+    """
+    Draws a random phonology and rate of consonants.
+
+    Returns the phonology, as returned by `random_phonology()`, and the
+    probability of each consonant slot being filled. The `legacy` flag
+    uses the frequencies of the legacy generation.
+    """
+
+    # get parameters as specified or default
+    # TODO: default `no_consonant` should depend on the system entropy
+    no_cons_low = param.get("no_cons_low", 0.33)
+    no_cons_high = param.get("no_cons_high", 0.66)
+
+    # get the 'phonotactics' of the language
+    tables = get_tables()
+    pattern = tables.random_syll_pattern(rng)
+    inv = {}
+    inv["vowels"] = tables.random_vowel_inv(rng)
+    inv["initials"], inv["medials"], inv["finals"] = tables.random_cons_inv(
+        pattern, rng
+    )
+    base_freq = get_frequency_table(resolve=not legacy)
+    phonology = random_phonology(inv, param, base_freq, seed=rng)
+    no_consonant = rng.uniform(low=no_cons_low, high=no_cons_high)
+
+    return phonology, no_consonant
+
+
+def _unlengthen_table(alphabet):
+    """
+    Returns the table mapping segment codes to those without length marks.
+
+    The table is rebuilt only when the alphabet grows.
+    """
+
+    # building the table can intern new segments, which need another pass
+    table = _UNLENGTHEN_TABLES.get(id(alphabet))
+    while table is None or len(table) != len(alphabet):
+        table = alphabet.table(lambda segment: segment.replace("ː", ""))
+        _UNLENGTHEN_TABLES[id(alphabet)] = table
+
+    return table
+
+
+_UNLENGTHEN_TABLES = {}
+
+
+class Phonology:
+    """
+    The phonology of a language, with cached sampling tables.
+
+    The object holds the inventories and frequencies of a language,
+    as returned by `random_phonology()`, along with the keys and alias
+    samplers for each slot class, so that any number of words for the same
+    language can be drawn without rebuilding them. Words are drawn in
+    batch: the number of syllables, the presence of each consonant slot and
+    the index of each phoneme are drawn for all words at once, in constant
+    time per phoneme, and strings are only built at the end.
+    """
+
+    SLOTS = ["vowels", "initials", "medials", "finals"]
+
+    def __init__(
+        self, phonology, no_consonant, param=None, remove_length=False
+    ):
+        if not param:
+            param = {}
+
+        self.phonology = phonology
+        self.no_consonant = no_consonant
+        self.remove_length = remove_length
+
+        # build the keys and alias samplers for each slot class
+        self.keys, self.samplers = {}, {}
+        for slot in self.SLOTS:
+            self.keys[slot] = np.array(sorted(phonology[slot]), dtype=object)
+            if phonology[slot]:
+                self.samplers[slot] = AliasSampler(
+                    [phonology[slot][phoneme] for phoneme in self.keys[slot]]
+                )
+
+        # we try to correct for entropy by manipulating the lambda of the
+        # number of syllables, so that languages with simpler phonotactics
+        # will tend to have more syllables
+        self.syl_lambda = param.get("base_syl_lambda", 10) / np.sqrt(
+            len(phonology["vowels"]) + len(phonology["medials"])
+        )
+
+    @classmethod
+    @abzu.instrument.stage("kiss.Phonology.random")
+    def random(cls, param, seed=None):
+        """
+        Returns a random phonology.
+
+        Parameters
+        ----------
+        param : dict
+            A dictionary of generation parameters; missing ones are set to
+            their default values.
+        seed : value
+            An optional seed for the random number generators, or a
+            `numpy.random.Generator` to draw from. Defaults to None.
+
+        Returns
+        -------
+        phonology : Phonology
+            The random phonology.
+        """
+
+        rng = abzu.utils.get_rng(seed)
+
+        phonology, no_consonant = _random_inventory(param, rng)
+
+        # decide on length removal, as it is a property of the language
+        remove_length = rng.random() < param.get("remove_length", 0.33)
+
+        return cls(phonology, no_consonant, param, remove_length)
+
+    @abzu.instrument.stage("kiss.Phonology.sample", count=len)
+    def sample(self, num_words, seed=None, encoded=False):
+        """
+        Returns a list of random words following the phonology.
+
+        The distribution is the same of the legacy word generation loop of
+        `random_words()`, but the random values are consumed in a different
+        order.
+
+        Parameters
+        ----------
+        num_words : int
+            The number of words to generate.
+        seed : value
+            An optional seed for the random number generators, or a
+            `numpy.random.Generator` to draw from. Defaults to None,
+            continuing the current global random state.
+        encoded : bool
+            Whether to return the words as segment codes of the shared
+            alphabet, leaving rendering to the caller. Defaults to False.
+
+        Returns
+        -------
+        words : list of strings or abzu.segments.EncodedWords
+            The list of words, with segments separated by spaces, or the
+            packed codes of the words if `encoded` is set.
+        """
+
+        rng = abzu.utils.get_rng(seed)
+
+        # draw the phonemes of all syllables, as a grid of slots
+        with abzu.instrument.section("kiss.Phonology.sample.draw", num_words):
+            # draw the number of syllables for all words, restricted to at most
+            # 5 syllables; words with a single syllable get another one 66% of
+            # the time, as in the legacy method
+            num_syl = np.minimum(
+                rng.poisson(self.syl_lambda, size=num_words) + 1, 5
+            )
+            extend = rng.random(num_words) < 0.66
+            num_syl[(num_syl == 1) & extend] = 2
+
+            # map each syllable to its word and to its position in the word
+            total_syl = int(num_syl.sum())
+            word_start = np.cumsum(num_syl) - num_syl
+            syl_pos = np.arange(total_syl) - np.repeat(word_start, num_syl)
+            first = syl_pos == 0
+            last = syl_pos == np.repeat(num_syl, num_syl) - 1
+
+            # the grid of slots, with one row per syllable and one column for
+            # onset, nucleus, and coda; missing slots hold empty strings
+            onset = rng.random(total_syl) < self.no_consonant
+            grid = np.empty((total_syl, 3), dtype=object)
+
+            grid[:, 0] = ""
+            for slot, mask in [
+                ("initials", onset & first),
+                ("medials", onset & ~first),
+            ]:
+                if slot in self.samplers:
+                    idx = self.samplers[slot].draw(int(mask.sum()), rng)
+                    grid[mask, 0] = self.keys[slot][idx]
+
+            idx = self.samplers["vowels"].draw(total_syl, rng)
+            grid[:, 1] = self.keys["vowels"][idx]
+
+            grid[:, 2] = ""
+            if "finals" in self.samplers:
+                coda = last & (rng.random(total_syl) < self.no_consonant)
+                idx = self.samplers["finals"].draw(int(coda.sum()), rng)
+                grid[coda, 2] = self.keys["finals"][idx]
+
+        # build the tokenized words from the flattened grid, splitting clusters
+        segments = grid.ravel().tolist()
+        bounds = np.append(word_start, total_syl) * 3
+        words = [
+            " ".join([seg for seg in segments[start:end] if seg]).split()
+            for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        ]
+
+        # apply basic, "universal", phonotactics
+        words = BASIC_PHONOTACTICS.rewrite_many(words)
+
+        # encode the words, removing all length symbols with a lookup table
+        # if so decided
+        if encoded:
+            alphabet = abzu.segments.get_alphabet()
+            words = alphabet.encode_many(words)
+            if self.remove_length:
+                words = words.map(_unlengthen_table(alphabet))
+
+            return words
+
+        words = [" ".join(word) for word in words]
+        if self.remove_length:
+            words = [word.replace("ː", "") for word in words]
+
+        return words
+
+    @abzu.instrument.stage(
+        "kiss.Phonology.sample_unique", count=lambda result: result[1]
+    )
+    def sample_unique(self, num_words, seed=None, seen=None, max_rounds=100):
+        """
+        Returns a list of distinct random words following the phonology.
+
+        Words are drawn in a batch as by `sample()`, and only those found
+        in `seen` or earlier in the batch are rejected and drawn again, in
+        further batches, until enough words are collected. The number of
+        rejected words is recorded as the items of the stage when profiling.
+
+        Parameters
+        ----------
+        num_words : int
+            The number of words to generate.
+        seed : value
+            An optional seed for the random number generators, or a
+            `numpy.random.Generator` to draw from. Defaults to None.
+        seen : set-like
+            An optional container of words to exclude, supporting `in` and
+            `add()`, such as a `set` or an `abzu.utils.BloomFilter`; the
+            returned words are added to it. Defaults to a new set.
+        max_rounds : int
+            The number of consecutive batches without any new word after
+            which the phonology is assumed to be exhausted. Defaults to 100.
+
+        Returns
+        -------
+        words : list of strings
+            The list of words, with segments separated by spaces.
+        resamples : int
+            The number of words that were rejected and drawn again.
+        """
+
+        rng = abzu.utils.get_rng(seed)
+        if seen is None:
+            seen = set()
+
+        words = []
+        resamples = 0
+        fruitless = 0
+        size = num_words
+        while len(words) < num_words:
+            found = len(words)
+            for word in self.sample(size, rng):
+                if word in seen:
+                    resamples += 1
+                else:
+                    seen.add(word)
+                    words.append(word)
+                    if len(words) == num_words:
+                        break
+
+            if len(words) > found:
+                fruitless = 0
+            else:
+                fruitless += 1
+                if fruitless == max_rounds:
+                    raise ValueError(
+                        "Unable to generate %i unique words" % num_words
+                    )
+
+            # draw at least a few words per batch, as the last ones can have
+            # high rejection rates
+            size = max(num_words - len(words), 16)
+
+        return words, resamples
+
+    def word(self, seed=None):
+        """
+        Returns a single random word following the phonology.
+
+        The word is drawn with scalar samples from the same distribution
+        as `sample()`, avoiding the overhead of array operations for the
+        interactive generation of individual words.
+        """
+
+        rng = abzu.utils.get_rng(seed)
+
+        num_syl = min(int(rng.poisson(self.syl_lambda)) + 1, 5)
+        if num_syl == 1 and rng.random() < 0.66:
+            num_syl = 2
+
+        segments = []
+        for syl in range(num_syl):
+            if rng.random() < self.no_consonant:
+                slot = "initials" if syl == 0 else "medials"
+                if slot in self.samplers:
+                    idx = self.samplers[slot].draw(rng=rng)
+                    segments += self.keys[slot][idx].split()
+
+            idx = self.samplers["vowels"].draw(rng=rng)
+            segments.append(self.keys["vowels"][idx])
+
+            if syl == num_syl - 1 and "finals" in self.samplers:
+                if rng.random() < self.no_consonant:
+                    idx = self.samplers["finals"].draw(rng=rng)
+                    segments += self.keys["finals"][idx].split()
+
+        word = " ".join(BASIC_PHONOTACTICS.rewrite(segments))
+        if self.remove_length:
+            word = word.replace("ː", "")
+
+        return word
+
+    def iter_words(self, chunk_size=1000, seed=None):
+        """
+        Yields an endless sequence of random words following the phonology.
+
+        Words are drawn in batches of `chunk_size`.
+        """
+
+        rng = abzu.utils.get_rng(seed)
+        while True:
+            yield from self.sample(chunk_size, rng)
+
+
+@abzu.instrument.stage("kiss.random_words", count=len)
+def random_words(num_words, param, seed=None, legacy=False, unique=False):
+    """
+    Returns a list of random words following a random phonology.
+
+    Parameters
+    ----------
+    num_words : int
+        The number of words to generate.
+    param : dict
+        A dictionary of generation parameters; missing ones are set to
+        their default values.
+    seed : value
+        An optional seed for the random number generators, or a
+        `numpy.random.Generator` to draw from. Defaults to None.
+    legacy : bool
+        Whether to use the original sampling loop, with one RNG call per
+        phoneme and decision, instead of the batched engine of `Phonology`.
+        The distribution of words is the same, but only the legacy method
+        reproduces the seeded output of version 0.1. Defaults to False.
+    unique : bool
+        Whether all words must be distinct, resampling only the accidental
+        homophones, as by `Phonology.sample_unique()`; the number of
+        resamples is recorded when profiling. Not available with `legacy`.
+        Defaults to False.
+
+    Returns
+    -------
+    words : list of strings
+        The list of words, with segments separated by spaces.
+    """
+
+    # set the seed
+    rng = abzu.utils.get_rng(seed)
+
+    if unique:
+        if legacy:
+            raise ValueError("Unique words are not available in legacy mode")
+
+        return Phonology.random(param, rng).sample_unique(num_words, rng)[0]
+
+    if legacy:
+        phonology, no_consonant = _random_inventory(param, rng, legacy=True)
+        return _random_words_legacy(
+            num_words, phonology, no_consonant, param, rng
+        )
+
+    return Phonology.random(param, rng).sample(num_words, rng)
+
+
+def iter_words(
+    param,
+    seed=None,
+    num_words=None,
+    chunk_size=1000,
+    chunks=False,
+    unique=False,
+):
+    """
+    Yields random words following a random phonology, in constant memory.
+
+    Words are drawn from a single phonology in batches of `chunk_size`, so
+    that only one batch is in memory at any time; for a `num_words` not
+    larger than `chunk_size`, the words are the same returned by
+    `random_words()` with the same seed.
+
+    Parameters
+    ----------
+    param : dict
+        A dictionary of generation parameters; missing ones are set to
+        their default values.
+    seed : value
+        An optional seed for the random number generators, or a
+        `numpy.random.Generator` to draw from. Defaults to None.
+    num_words : int
+        The number of words to generate, with `None` for an endless
+        sequence. Defaults to None.
+    chunk_size : int
+        The number of words drawn in each batch. Defaults to 1000.
+    chunks : bool
+        Whether to yield the lists of words of each batch instead of
+        individual words. Defaults to False.
+    unique : bool
+        Whether all words must be distinct, as for `random_words()`. Words
+        are tracked with a set, or with a Bloom filter when `num_words` is
+        larger than `UNIQUE_SET_LIMIT`, so that memory stays bounded at the
+        cost of a few unnecessary resamples. Defaults to False.
+
+    Returns
+    -------
+    words : generator of strings or of lists of strings
+        The words, with segments separated by spaces, or their batches.
+    """
+
+    rng = abzu.utils.get_rng(seed)
+    phonology = Phonology.random(param, rng)
+
+    seen = None
+    if unique:
+        if num_words is None or num_words <= UNIQUE_SET_LIMIT:
+            seen = set()
+        else:
+            seen = abzu.utils.BloomFilter(num_words)
+
+    while num_words is None or num_words > 0:
+        size = chunk_size if num_words is None else min(chunk_size, num_words)
+        if unique:
+            words = phonology.sample_unique(size, rng, seen)[0]
+        else:
+            words = phonology.sample(size, rng)
+        if num_words is not None:
+            num_words -= size
+
+        if chunks:
+            yield words
+        else:
+            yield from words
+
+
+class PhonotacticRules:
+    """
+    Compiled, ordered set of rewrite rules over tokenized words.
+
+    Rules are pairs of source and target strings in the notation of regular
+    expressions over space-separated segments, such as `("(.) \\1", "\\1ː")`
+    or `("(p|t|k) h", "\\1ʰ")`. Each element is either a literal segment,
+    a capture of one segment (any single character with `.`, or one of a
+    list of alternatives), or a back-reference, all optionally followed
+    by a literal suffix such as the length mark. Rules are compiled once
+    and applied, in order, to tuples of segments with the same semantics
+    of `re.sub()` on the space-joined string, including the non-overlap
+    of matches sharing a separator. Rules are indexed by the segments
+    they require, so that those which cannot apply to a word are skipped
+    without scanning it.
+
+    Results are memoized in a bounded LRU cache keyed on the sequence of
+    segments, as small inventories produce many identical raw forms; the
+    cache is thread-safe, and its statistics are available with
+    `cache_info()`. A `cache_size` of zero disables it.
+    """
+
+    _ELEMENT = re.compile(
+        r"^(?:\((?P<capture>[^)]+)\)|\\(?P<ref>\d))?(?P<suffix>[^()\\]*)$"
+    )
+
+    def __init__(self, rules, cache_size=100000):
+        self.cache_size = cache_size
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._rewrite)
+
+        self.rules = [
+            (self._compile_source(source), self._compile_target(target))
+            for source, target in rules
+        ]
+
+        # build an index from segments to bitmasks of the rule requirements
+        # they satisfy, so that the applicable rules for a word are found by
+        # comparing a single integer; bit zero is reserved for the repetition
+        # of a first character, needed by captures followed by back-references
+        self._masks = []
+        self._segment_bits = {}
+        bit = 1
+        for (elements, required), _ in self.rules:
+            mask = 0
+            if len(elements) > 1 and elements[0][0] == "any":
+                if elements[1][0] == "ref":
+                    mask |= 1
+
+            for req in required:
+                bit <<= 1
+                mask |= bit
+                for segment in req:
+                    self._segment_bits[segment] = (
+                        self._segment_bits.get(segment, 0) | bit
+                    )
+
+            self._masks.append(mask)
+
+    @classmethod
+    def _compile_source(cls, source):
+        """
+        Compiles the source of a rule into a tuple of element matchers.
+
+        Each element is a tuple of kind, data, and suffix, where kind is one
+        of `"literal"`, `"any"`, `"set"`, or `"ref"`; the tuple of the
+        segment sets required for a match is also returned.
+        """
+
+        elements, required = [], []
+        for element in source.split():
+            match = cls._ELEMENT.match(element)
+            if not match:
+                raise ValueError("Invalid rule element `%s`" % element)
+
+            suffix = match.group("suffix")
+            if match.group("ref"):
+                elements.append(("ref", int(match.group("ref")) - 1, suffix))
+            elif match.group("capture") == ".":
+                elements.append(("any", None, suffix))
+            elif match.group("capture"):
+                alternatives = frozenset(match.group("capture").split("|"))
+                elements.append(("set", alternatives, suffix))
+                required.append(
+                    frozenset(alt + suffix for alt in alternatives)
+                )
+            else:
+                elements.append(("literal", suffix, ""))
+                required.append(frozenset([suffix]))
+
+        return tuple(elements), tuple(required)
+
+    @classmethod
+    def _compile_target(cls, target):
+        """
+        Compiles the target of a rule into a tuple of (reference, suffix).
+
+        Literal segments carry a `None` reference.
+        """
+
+        elements = []
+        for element in target.split():
+            match = cls._ELEMENT.match(element)
+            if not match or match.group("capture"):
+                raise ValueError("Invalid rule target `%s`" % element)
+
+            ref = match.group("ref")
+            elements.append(
+                (int(ref) - 1 if ref else None, match.group("suffix"))
+            )
+
+        return tuple(elements)
+
+    @staticmethod
+    def _match(elements, segments, start):
+        """
+        Matches a compiled source at a position, returning the groups.
+
+        Returns `None` if there is no match.
+        """
+
+        groups = []
+        for (kind, data, suffix), segment in zip(
+            elements, segments[start : start + len(elements)]
+        ):
+            if kind == "literal":
+                if segment != data:
+                    return None
+            elif kind == "ref":
+                if segment != groups[data] + suffix:
+                    return None
+            else:
+                if suffix:
+                    if not segment.endswith(suffix):
+                        return None
+                    segment = segment[: -len(suffix)]
+
+                if kind == "any":
+                    if len(segment) != 1:
+                        return None
+                elif segment not in data:
+                    return None
+
+                groups.append(segment)
+
+        return groups
+
+    def _apply(self, rule, segments):
+        """
+        Applies a single compiled rule to a list of segments.
+
+        Returns `None` if the rule does not match.
+        """
+
+        (elements, required), target = rule
+        size = len(elements)
+        last = len(segments) - size + 1
+
+        # collect the candidate starting positions, either from the set of
+        # segments allowed in the first position or, for captures of any
+        # segment followed by a back-reference, from pairs of segments
+        # sharing the first character
+        if required and elements[0][0] != "any":
+            first = required[0]
+            starts = [idx for idx in range(last) if segments[idx] in first]
+        elif size > 1 and elements[1][0] == "ref":
+            starts = [
+                idx
+                for idx in range(last)
+                if segments[idx][0] == segments[idx + 1][:1]
+            ]
+        else:
+            starts = range(last)
+
+        # collect the matches; the separator following a match is consumed
+        # by it, so that the next segment cannot start a new match
+        ret = []
+        idx, changed = 0, False
+        for start in starts:
+            if start < idx:
+                continue
+
+            groups = self._match(elements, segments, start)
+            if groups is not None:
+                ret += segments[idx:start]
+                ret += [
+                    groups[ref] + suffix if ref is not None else suffix
+                    for ref, suffix in target
+                ]
+                idx = start + size + 1
+                ret += segments[start + size : idx]
+                changed = True
+
+        if not changed:
+            return None
+
+        return ret + segments[idx:]
+
+    def _mask(self, segments):
+        """
+        Returns the bitmask of rule requirements satisfied by the segments.
+        """
+
+        mask = 0
+        for segment in segments:
+            mask |= self._segment_bits.get(segment, 0)
+
+        prev = ""
+        for segment in segments:
+            if segment[0] == prev:
+                mask |= 1
+                break
+            prev = segment[0]
+
+        return mask
+
+    def __getstate__(self):
+        # the cache cannot be pickled, and is rebuilt when unpickling
+        state = self.__dict__.copy()
+        del state["_cached"]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cached = functools.lru_cache(maxsize=self.cache_size)(
+            self._rewrite
+        )
+
+    def cache_info(self):
+        """
+        Returns the hits, misses, and size of the cache of results.
+        """
+
+        return self._cached.cache_info()
+
+    def cache_clear(self):
+        """
+        Clears the cache of results, for example between languages.
+        """
+
+        self._cached.cache_clear()
+
+    @abzu.instrument.stage("kiss.PhonotacticRules.rewrite")
+    def rewrite(self, segments):
+        """
+        Applies all rules, in order, to a sequence of segments.
+
+        Word boundaries are added for the manipulation and removed from the
+        returned tuple of segments.
+        """
+
+        return self._cached(tuple(segments))
+
+    def _rewrite(self, segments):
+        """
+        Applies all rules to a tuple of segments, without caching.
+        """
+
+        # add boundaries for manipulation
+        segments = ["#"] + list(segments) + ["#"]
+        mask = self._mask(segments)
+
+        for rule, rule_mask in zip(self.rules, self._masks):
+            # skip rules requiring segments not found in the word
+            if mask & rule_mask != rule_mask:
+                continue
+
+            new_segments = self._apply(rule, segments)
+            if new_segments is not None:
+                segments = new_segments
+                mask = self._mask(segments)
+
+        # remove boundaries and return
+        return tuple(segment for segment in segments if segment != "#")
+
+    @abzu.instrument.stage("kiss.PhonotacticRules.rewrite_many", count=len)
+    def rewrite_many(self, words):
+        """
+        Applies all rules to a list of words, each a sequence of segments.
+        """
+
+        return [self.rewrite(segments) for segments in words]
+
+
 # TODO: redo with the sound change engine later
 # TODO: make sure there is something left
-def apply_basic_phonotactics(word):
-    rules = [
+BASIC_PHONOTACTICS = PhonotacticRules(
+    [
         # remove runs of three equal sounds, lengthening
-        [r" (.) \1 \1 ", r" \1ː "],
+        [r"(.) \1 \1", r"\1ː"],
         # remove runs of two equal sounds, lengthening
-        [r" (.) \1 ", r" \1ː "],
+        [r"(.) \1", r"\1ː"],
         # remove runs of two equal sounds, the first long, lengthening
-        [r" (.)ː \1 ", r" \1ː "],
+        [r"(.)ː \1", r"\1ː"],
         # converts most vowel clusters to vowel+glide or glide + vowel
-        [r" (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) (i|y|ɨ|ʏ) ", r" \1 j "],
-        [r" (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) (ɯ|u|ʊ) ", r" \1 w "],
-        [r" (i|y|ɨ|ʏ) (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) ", r" j \1 "],
-        [r" (ɯ|u|ʊ) (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) ", r" w \1 "],
+        [r"(i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) (i|y|ɨ|ʏ)", r"\1 j"],
+        [r"(i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) (ɯ|u|ʊ)", r"\1 w"],
+        [r"(i|y|ɨ|ʏ) (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ)", r"j \1"],
+        [r"(ɯ|u|ʊ) (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ)", r"w \1"],
         # don't allow long glides
-        [r" (j|w)ː ", r" \1 "],
+        [r"(j|w)ː", r"\1"],
         # remove less stable glide+vowel combinations
-        [r" (i|y|ɨ|ʏ) j ", r" \1 "],
-        [r" (ɯ|u|ʊ) w ", r" \1 "],
-        [r" j (i|y|ɨ|ʏ) ", r" \1 "],
-        [r" w (ɯ|u|ʊ) ", r" \1 "],
+        [r"(i|y|ɨ|ʏ) j", r"\1"],
+        [r"(ɯ|u|ʊ) w", r"\1"],
+        [r"j (i|y|ɨ|ʏ)", r"\1"],
+        [r"w (ɯ|u|ʊ)", r"\1"],
         # aspiration
-        [r" (p|t|k) h ", r" \1ʰ "],
+        [r"(p|t|k) h", r"\1ʰ"],
         # intervocalic /j/ to /ʒ/
         [
-            r" (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) j (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) ",
-            r" \1 ʒ \2 ",
+            r"(i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ) j (i|y|ɨ|ʉ|ɯ|u|ɪ|ʏ|ʊ|e|o|ɛ|ɜ|ʌ|ɔ|æ|ɐ|a|ɑ|ɒ)",
+            r"\1 ʒ \2",
         ],
         # double j/w still left
-        [r" j j ", r" j "],
-        [r" w w ", r" w "],
+        [r"j j", r"j"],
+        [r"w w", r"w"],
         # fix vowel length problems
-        [r" (.)ː \1ː ", r" \1ː "],
-        [r" (.) \1ː ", r" \1ː "],
-        [r" (.)ː \1 ", r" \1ː "],
-        [r" (.) \1 ", r" \1ː "],
+        [r"(.)ː \1ː", r"\1ː"],
+        [r"(.) \1ː", r"\1ː"],
+        [r"(.)ː \1", r"\1ː"],
+        [r"(.) \1", r"\1ː"],
         # problems with glides at borders
-        [r" # w j ", r" # u j "],
-        [r" # j w ", r" # i w "],
-        [r" w j # ", r" w i # "],
-        [r" j w # ", r" j u # "],
+        [r"# w j", r"# u j"],
+        [r"# j w", r"# i w"],
+        [r"w j #", r"w i #"],
+        [r"j w #", r"j u #"],
     ]
+)
 
-    # add boundaries for manipulation
-    word = " # %s # " % word
 
-    # apply regexes
-    for rule in rules:
-        word = re.sub(rule[0], rule[1], word)
+@abzu.instrument.stage("kiss.apply_basic_phonotactics")
+def apply_basic_phonotactics(word):
+    """
+    Applies the basic, "universal", phonotactics to a space-separated word.
 
-    # remove boundaries, strip, and return
-    word = word.replace("#", "").strip()
+    This is a wrapper to `BASIC_PHONOTACTICS.rewrite()` for words
+    represented as strings.
+    """
 
-    return word
+    return " ".join(BASIC_PHONOTACTICS.rewrite(word.split()))
 
 
 # TODO: implement properly
-def single_random_word(seed=None):
-    abzu.utils.seed_rngs(seed)
-    return random_words(1, {})[0]
+def single_random_word(seed=None, legacy=False, phonology=None):
+    rng = abzu.utils.get_rng(seed)
+    if legacy:
+        return random_words(1, {}, seed=rng, legacy=legacy)[0]
+
+    # reuse the phonology, with its samplers, if one is given
+    if not phonology:
+        phonology = Phonology.random({}, rng)
+
+    return phonology.word(rng)
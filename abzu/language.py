@@ -1,14 +1,293 @@
+# Import Python standard libraries
+from array import array
+import bisect
+
+# Import 3rd party libraries
+import numpy as np
+
+# Import other modules
+import abzu.instrument
 import abzu.utils
 import abzu.kiss
+import abzu.textgen
+from abzu.segments import ALPHABET
+
 
 class Language:
-    def __init__(self):
-        self.name = None
-        self.vocab = {}
+    """
+    A language, with a name, a phonology, and a vocabulary.
+
+    The vocabulary maps concepts, identified by the gloss IDs of
+    `glosses.tsv` (with larger integers for concepts beyond those), to
+    words. To keep the memory footprint of each language small, words are
+    stored as the codes of their segments in the shared alphabet of
+    `abzu.segments`, concatenated in a single array with the offsets of
+    each word, in order of concept ID.
+    """
+
+    __slots__ = ("name", "phonology", "_concepts", "_offsets", "_segments")
+
+    def __init__(self, phonology=None, name=None):
+        self.name = name
+        self.phonology = phonology
+        self._concepts = array("I")
+        self._offsets = array("I", [0])
+        self._segments = array("H")
+
+    def __len__(self):
+        return len(self._concepts)
+
+    def __contains__(self, concept):
+        return self._find(concept) is not None
+
+    def __getitem__(self, concept):
+        idx = self._find(concept)
+        if idx is None:
+            raise KeyError(concept)
+
+        return ALPHABET.decode(self._word(idx))
+
+    def __getstate__(self):
+        # segment codes depend on the order of interning, which can differ
+        # among processes, so the segments themselves are included
+        return (
+            self.name,
+            self.phonology,
+            self._concepts,
+            self._offsets,
+            self._segments,
+            ALPHABET.segments[: max(self._segments, default=-1) + 1],
+        )
+
+    def __setstate__(self, state):
+        self.name, self.phonology, concepts, offsets, codes, segments = state
+        self._concepts = concepts
+        self._offsets = offsets
+
+        mapping = [ALPHABET.intern(segment) for segment in segments]
+        self._segments = array("H", [mapping[code] for code in codes])
+
+    def _find(self, concept):
+        """
+        Returns the index of a concept in the vocabulary, or `None`.
+        """
+
+        idx = bisect.bisect_left(self._concepts, concept)
+        if idx < len(self._concepts) and self._concepts[idx] == concept:
+            return idx
+
+        return None
+
+    def _word(self, idx):
+        """
+        Returns the segment codes of the word at an index.
+        """
+
+        return self._segments[self._offsets[idx] : self._offsets[idx + 1]]
+
+    @property
+    def concepts(self):
+        """
+        The list of concept IDs in the vocabulary, in order.
+        """
+
+        return self._concepts.tolist()
+
+    @property
+    def vocab(self):
+        """
+        A dictionary of concept IDs to words, built on access.
+        """
+
+        return dict(self.items())
+
+    def items(self):
+        """
+        Yields pairs of concept ID and word, in order of concept ID.
+        """
+
+        for idx, concept in enumerate(self._concepts):
+            yield concept, ALPHABET.decode(self._word(idx))
+
+    def append(self, concept, word):
+        """
+        Adds a word for a concept.
+
+        The word can be given as a string of space-separated segments or as
+        a sequence of segments. Concepts following the last one are
+        appended in place; any other is handled by `assign()`.
+        """
+
+        if self._concepts and concept <= self._concepts[-1]:
+            self.assign({concept: word})
+            return
+
+        self._concepts.append(concept)
+        self._segments.extend(ALPHABET.encode(word))
+        self._offsets.append(len(self._segments))
+
+    def assign(self, words):
+        """
+        Sets the words of many concepts at once.
+
+        Words for concepts already in the vocabulary are replaced. The
+        storage is rebuilt once for the entire update.
+
+        Parameters
+        ----------
+        words : dict or iterable of pairs
+            The concept IDs and their words, as strings of space-separated
+            segments or as sequences of segments.
+        """
+
+        words = dict(words)
+        if not words:
+            return
+
+        # unless there is something to replace or to insert, append
+        if not self._concepts or min(words) > self._concepts[-1]:
+            for concept in sorted(words):
+                self.append(concept, words[concept])
+            return
+
+        merged = {
+            concept: self._word(idx)
+            for idx, concept in enumerate(self._concepts)
+        }
+        merged.update(
+            {concept: ALPHABET.encode(word) for concept, word in words.items()}
+        )
+
+        self._concepts = array("I")
+        self._offsets = array("I", [0])
+        self._segments = array("H")
+        for concept in sorted(merged):
+            self._concepts.append(concept)
+            self._segments.extend(merged[concept])
+            self._offsets.append(len(self._segments))
+
+    @abzu.instrument.stage("language.Language.add_words")
+    def add_words(self, num_words, seed=None, colexify=True):
+        """
+        Appends random words for the concepts following the last one.
+
+        Concepts are taken in order of gloss ID. If `colexify` is set,
+        colexifications among the new concepts are drawn from the concept
+        graph, and colexified concepts take the word of an earlier one.
+        """
+
+        # the phonology is drawn on first use and kept for the language, so
+        # that all words follow the same one
+        rng = abzu.utils.get_rng(seed)
+        if not self.phonology:
+            self.phonology = abzu.kiss.Phonology.random({}, rng)
+
+        words = self.phonology.sample(num_words, rng, encoded=True)
+
+        # `abzu.concepts` is imported by the package on first access
+        graph = abzu.concepts.get_concept_graph()
+        first = self._concepts[-1] + 1 if self._concepts else int(graph.ids[0])
+        concepts = range(first, first + num_words)
+
+        # the index of the word taken by each concept
+        word_idx = np.arange(num_words)
+        if colexify:
+            positions = [
+                pos for pos, concept in enumerate(concepts) if concept in graph
+            ]
+            sources = graph.colexify(
+                [graph.row(concepts[pos]) for pos in positions], rng
+            )
+            for pos, source in zip(positions, sources):
+                word_idx[pos] = word_idx[positions[source]]
+
+        # append the codes of all words at once
+        starts, ends = words.offsets[word_idx], words.offsets[word_idx + 1]
+        codes = np.concatenate(
+            [words.codes[start:end] for start, end in zip(starts, ends)]
+            or [words.codes[:0]]
+        )
+        offsets = len(self._segments) + np.cumsum(ends - starts)
+        self._concepts.extend(concepts)
+        self._segments.frombytes(
+            codes.astype(self._segments.typecode).tobytes()
+        )
+        self._offsets.frombytes(
+            offsets.astype(self._offsets.typecode).tobytes()
+        )
+
+
+def random_language(size, seed=None, param=None):
+    """
+    Returns a random language, with a name, a phonology, and a vocabulary.
+
+    Parameters
+    ----------
+    size : int
+        The number of words in the vocabulary.
+    seed : value
+        An optional seed for the random number generators, or a
+        `numpy.random.Generator` to draw from. Defaults to None.
+    param : dict
+        An optional dictionary of generation parameters. Defaults to None.
+
+    Returns
+    -------
+    language : Language
+        The random language.
+    """
+
+    rng = abzu.utils.get_rng(seed)
+
+    lang = Language(abzu.kiss.Phonology.random(param or {}, rng))
+    lang.name = abzu.textgen.random_labels(1, rng)[0]
+    lang.add_words(size, rng)
+
+    return lang
+
+
+def _generate_language(task):
+    """
+    Generates a language from a seed sequence, in a worker process.
+    """
+
+    seed, size, param = task
+
+    return random_language(size, np.random.default_rng(seed), param)
+
+
+def generate_languages(num_langs, size, seed=None, workers=1, param=None):
+    """
+    Generates random languages, optionally in parallel.
+
+    Each language is generated from its own random stream, spawned from the
+    master seed with `numpy.random.SeedSequence.spawn()`, so that results
+    only depend on the seed and are identical regardless of the number of
+    workers. Languages are streamed back in order as they are generated.
+
+    Parameters
+    ----------
+    num_langs : int
+        The number of languages to generate.
+    size : int
+        The number of words in the vocabulary of each language.
+    seed : value
+        An optional master seed. Defaults to None.
+    workers : int
+        The number of worker processes, with `None` using all available
+        CPUs. Defaults to one, generating in the current process.
+    param : dict
+        An optional dictionary of generation parameters. Defaults to None.
+
+    Returns
+    -------
+    languages : generator of Language
+        The languages, in order.
+    """
 
-    # TODO: proper concept generation, etc.
-    def add_words(self, num_words, seed=None):
+    children = abzu.utils.seed_sequence(seed).spawn(num_langs)
+    tasks = ((child, size, param) for child in children)
 
-        words = abzu.kiss.random_words(num_words, {}, seed=seed)
-        for idx, word in enumerate(words):
-            self.vocab[f"concept-{idx+1}"] = word
+    yield from abzu.utils.parallel_map(
+        _generate_language, tasks, workers=workers, chunksize=16
+    )
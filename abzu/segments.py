@@ -0,0 +1,217 @@
+# encoding: utf-8
+
+"""
+Module for interning segments as small integers.
+
+Words are stored as arrays of segment codes, which take two bytes per
+segment and can be compared and hashed without parsing strings; strings
+are only built when words are rendered. The shared alphabet is populated
+on first use with all graphemes of the resources, so that the codes of
+known segments are the same in every process.
+"""
+
+# Import Python standard libraries
+from array import array
+import functools
+
+# Import 3rd party libraries
+import numpy as np
+
+# Import other modules
+import abzu.utils
+
+
+class Alphabet:
+    """
+    Mapping of segments to consecutive integer codes.
+
+    Codes are assigned in order of interning and fit in an unsigned 16-bit
+    integer, the `"H"` type of the `array` module.
+    """
+
+    __slots__ = ("segments", "codes")
+
+    def __init__(self, segments=()):
+        self.segments = []
+        self.codes = {}
+        for segment in segments:
+            self.intern(segment)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __contains__(self, segment):
+        return segment in self.codes
+
+    def intern(self, segment):
+        """
+        Returns the code of a segment, adding it to the alphabet if needed.
+        """
+
+        code = self.codes.get(segment)
+        if code is None:
+            code = len(self.segments)
+            if code > 0xFFFF:
+                raise ValueError("Too many segments in alphabet")
+            self.segments.append(segment)
+            self.codes[segment] = code
+
+        return code
+
+    def encode(self, word):
+        """
+        Returns the codes of a word, given as a string of space-separated
+        segments or as a sequence of segments.
+        """
+
+        if isinstance(word, str):
+            word = word.split()
+
+        return array("H", [self.intern(segment) for segment in word])
+
+    def decode(self, codes):
+        """
+        Returns a word as a string of space-separated segments.
+        """
+
+        return " ".join([self.segments[code] for code in codes])
+
+    def encode_many(self, words):
+        """
+        Returns the codes of many words, packed in an `EncodedWords`.
+        """
+
+        codes, offsets = [], [0]
+        for word in words:
+            if isinstance(word, str):
+                word = word.split()
+            codes += [self.intern(segment) for segment in word]
+            offsets.append(len(codes))
+
+        return EncodedWords(
+            np.array(codes, dtype=np.uint16),
+            np.array(offsets, dtype=np.int64),
+            self,
+        )
+
+    def table(self, func):
+        """
+        Returns an array mapping each code to the code of `func(segment)`.
+
+        Tables allow to apply segment-wise transformations to any number of
+        encoded words with a single indexing operation.
+        """
+
+        return np.array(
+            [self.intern(func(segment)) for segment in list(self.segments)],
+            dtype=np.uint16,
+        )
+
+
+class EncodedWords:
+    """
+    A sequence of words packed as segment codes.
+
+    The codes of all words are concatenated in a single `uint16` array,
+    with the boundaries of each word in `offsets`. Indexing returns a view
+    on the codes of a word, and strings are only built by `render()` and
+    `tolist()`.
+    """
+
+    __slots__ = ("codes", "offsets", "alphabet")
+
+    def __init__(self, codes, offsets, alphabet):
+        self.codes = codes
+        self.offsets = offsets
+        self.alphabet = alphabet
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        return self.codes[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def key(self, idx):
+        """
+        Returns a hashable key for a word, the bytes of its codes.
+        """
+
+        return self[idx].tobytes()
+
+    def render(self, idx):
+        """
+        Returns a word as a string of space-separated segments.
+        """
+
+        return self.alphabet.decode(self[idx].tolist())
+
+    def tolist(self):
+        """
+        Returns all words as strings of space-separated segments.
+        """
+
+        segments = np.array(self.alphabet.segments, dtype=object)[self.codes]
+        segments = segments.tolist()
+        offsets = self.offsets.tolist()
+
+        return [
+            " ".join(segments[start:end])
+            for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def map(self, table):
+        """
+        Returns the words with each code mapped through a table.
+        """
+
+        return EncodedWords(table[self.codes], self.offsets, self.alphabet)
+
+
+def resource_segments(registry=None):
+    """
+    Returns the sorted list of segments found in the resources.
+
+    Segments are collected from the vowel and consonant inventories, with
+    clusters split into their segments, and from the phoneme frequencies,
+    along with their long counterparts.
+    """
+
+    if not registry:
+        registry = abzu.utils.RESOURCES
+
+    graphemes = set()
+    for entry in registry["vowel_inventories"].values():
+        graphemes.update(entry["VOWELS"].split("|"))
+    for entry in registry["consonant_inventories"].values():
+        for slot in ["INITIAL", "MEDIAL", "FINAL"]:
+            for cluster in entry[slot].split("|"):
+                graphemes.update(cluster.split())
+    for entry in registry["phoneme_frequency"].values():
+        graphemes.add(entry["GRAPHEME"])
+
+    graphemes.discard("")
+    graphemes.update(
+        [grapheme + "ː" for grapheme in graphemes if grapheme[-1] != "ː"]
+    )
+
+    return sorted(graphemes)
+
+
+# The alphabet shared by all modules
+ALPHABET = Alphabet()
+
+
+@functools.lru_cache(maxsize=1)
+def get_alphabet():
+    """
+    Returns the shared alphabet, populating it with the resource segments.
+    """
+
+    for segment in resource_segments():
+        ALPHABET.intern(segment)
+
+    return ALPHABET
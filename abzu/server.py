@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# encoding: utf-8
+
+"""
+server.py
+
+Local HTTP service for generating words, labels, and species names.
+
+The service keeps the resources and the precomputed tables loaded, so that
+tools calling Abzu repeatedly do not pay for the import and the parsing of
+the data files on every run. It is built on `asyncio` and the standard
+library only: requests are handled concurrently, and generation, which is
+bound by the CPU, is offloaded to a pool of worker processes, each warmed
+up once when started. Requests are made with `GET` and query parameters,
+or with `POST` and a JSON object, and answered with JSON:
+
+    $ python -m abzu.server --port 8000 --workers 4
+    $ curl 'http://127.0.0.1:8000/random_words?size=3&seed=jena'
+    {"words": ["ə ĩ j ŋ", "p ɑ ɪ", "j ẽ ʃ i w ŋ"]}
+
+The parameters are `size` (the number of items, defaulting to 10), `seed`
+(an optional string, for reproducibility), and, for words only, `unique`.
+The service is meant for local use, and binds to the loopback interface
+by default.
+"""
+
+# Import Python standard libraries
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import logging
+import os
+import urllib.parse
+
+import abzu
+
+# The largest request body accepted, in bytes
+MAX_BODY = 65536
+
+# Reason phrases of the status codes used in responses
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+
+def _random_words(size, seed, unique):
+    return abzu.kiss.random_words(size, {}, seed=seed, unique=unique)
+
+
+def _random_labels(size, seed, unique):
+    return abzu.random_labels(size, seed)
+
+
+def _random_species(size, seed, unique):
+    return abzu.random_species(size, seed)
+
+
+# Endpoints, with the generation function, run in a worker, and the key of
+# the results in the response
+ENDPOINTS = {
+    "random_words": (_random_words, "words"),
+    "random_labels": (_random_labels, "labels"),
+    "random_species": (_random_species, "species"),
+}
+
+
+def warm_up():
+    """
+    Loads the resources and fills the caches of all generators.
+
+    This is run once by each worker process when it starts.
+    """
+
+    for func, _ in ENDPOINTS.values():
+        func(1, None, False)
+
+
+def _bool(value):
+    """
+    Parses a boolean parameter, from JSON or from a query string.
+    """
+
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes")
+
+    return bool(value)
+
+
+class GenerationServer:
+    """
+    Asynchronous HTTP server for the generation functions.
+
+    Parameters
+    ----------
+    host : str
+        The interface to bind to. Defaults to `"127.0.0.1"`.
+    port : int
+        The port to listen on, with zero for any free port. Defaults to 8000.
+    workers : int
+        The number of worker processes; zero runs the generation in a single
+        thread of the server process, and `None` uses all available CPUs.
+        Defaults to 1.
+    max_size : int
+        The largest number of items that can be requested at once. Defaults
+        to 1000000.
+    """
+
+    def __init__(
+        self, host="127.0.0.1", port=8000, workers=1, max_size=1000000
+    ):
+        self.host = host
+        self.port = port
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_size = max_size
+        self._server = None
+        self._executor = None
+
+    async def start(self):
+        """
+        Starts the worker pool and begins accepting connections.
+        """
+
+        if self.workers:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=warm_up
+            )
+        else:
+            # the global random state is not safe to share among threads
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, warm_up
+            )
+
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info("Serving on http://%s:%i", self.host, self.port)
+
+    async def serve_forever(self):
+        """
+        Starts the server, if needed, and serves until cancelled.
+        """
+
+        if self._server is None:
+            await self.start()
+
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops accepting connections and shuts down the worker pool.
+        """
+
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def generate(self, endpoint, params):
+        """
+        Runs a request in the worker pool, returning the status and payload.
+
+        Parameters
+        ----------
+        endpoint : str
+            The name of the endpoint, such as `"random_words"`.
+        params : dict
+            The parameters of the request.
+
+        Returns
+        -------
+        status : int
+            The HTTP status code.
+        payload : dict
+            The JSON-serializable response.
+        """
+
+        if endpoint not in ENDPOINTS:
+            return 404, {"error": "Unknown endpoint `%s`" % endpoint}
+        func, key = ENDPOINTS[endpoint]
+
+        try:
+            size = int(params.get("size", 10))
+        except (TypeError, ValueError):
+            return 400, {"error": "Invalid size"}
+        if not 0 < size <= self.max_size:
+            return 400, {
+                "error": "Size must be between 1 and %i" % self.max_size
+            }
+
+        seed = params.get("seed")
+        if seed is not None:
+            seed = str(seed)
+        unique = _bool(params.get("unique", False))
+
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, size, seed, unique
+            )
+        except ValueError as exc:
+            return 400, {"error": str(exc)}
+
+        return 200, {key: result}
+
+    async def _read_request(self, reader):
+        """
+        Reads an HTTP request, returning method, path, query, and body.
+        """
+
+        request_line = await reader.readline()
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if not 0 <= length <= MAX_BODY:
+            raise ValueError("Invalid request body")
+        body = await reader.readexactly(length) if length else b""
+
+        url = urllib.parse.urlsplit(target)
+
+        return method.upper(), url.path, url.query, body
+
+    async def _handle(self, reader, writer):
+        """
+        Handles a connection, answering a single request.
+        """
+
+        try:
+            try:
+                method, path, query, body = await self._read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError):
+                status, payload = 400, {"error": "Malformed request"}
+            else:
+                status, payload = await self._dispatch(
+                    method, path, query, body
+                )
+        except Exception:
+            logging.exception("Error handling request")
+            status, payload = 500, {"error": "Internal server error"}
+
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            (
+                "HTTP/1.1 %i %s\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                "Content-Length: %i\r\n"
+                "Connection: close\r\n\r\n"
+                % (status, _REASONS[status], len(data))
+            ).encode("latin-1")
+            + data
+        )
+
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, query, body):
+        """
+        Routes a request, returning the status and payload.
+        """
+
+        if method not in ("GET", "POST"):
+            return 405, {"error": "Method not allowed"}
+
+        endpoint = path.strip("/")
+        if not endpoint:
+            return 200, {
+                "abzu": abzu.__version__,
+                "endpoints": list(ENDPOINTS),
+            }
+
+        if method == "POST" and body:
+            try:
+                params = json.loads(body)
+            except ValueError:
+                return 400, {"error": "Invalid JSON body"}
+            if not isinstance(params, dict):
+                return 400, {"error": "Parameters must be a JSON object"}
+        else:
+            params = dict(urllib.parse.parse_qsl(query))
+
+        return await self.generate(endpoint, params)
+
+
+def serve(host="127.0.0.1", port=8000, workers=1, max_size=1000000):
+    """
+    Runs a `GenerationServer` until interrupted.
+    """
+
+    server = GenerationServer(host, port, workers, max_size)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Abzu generation service.")
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="The interface to bind to. Defaults to 127.0.0.1.",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8000,
+        help="The port to listen on. Defaults to 8000.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of worker processes, with 0 for generating in the "
+        "server process. Defaults to 1.",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        default=1000000,
+        help="The largest number of items per request. Defaults to 1000000.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.workers, args.max_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# encoding: utf-8
+
+"""
+Module for applying ordered cascades of sound changes.
+
+Rules follow the usual notation of sound change appliers, in the style of
+`alteruphono`, such as `"p > b / V _ V"`, `"k|g > tʃ|dʒ / _ i"`, or
+`"h > ∅ / _ #"`. The source of a rule is a segment, a list of alternatives
+separated by `|`, or a class of segments such as `V` for vowels; the
+target is a segment, a parallel list of alternatives, or `∅` (also `0`)
+for deletion; the optional context lists the elements that must precede
+and follow the source, around an underscore, with `#` for word boundaries.
+Each rule applies simultaneously to all positions of a word, and rules
+apply in order.
+
+A cascade is compiled once: sources and contexts are resolved to sets of
+segments, and rules are indexed by the segments that can trigger them,
+so that only the rules whose source is found in a word are tried. The
+results are memoized per word, as many words share the same forms.
+"""
+
+# Import Python standard libraries
+import functools
+
+# Import other modules
+import abzu.utils
+
+# Symbols for deletion in rule targets
+DELETION = ("∅", "0")
+
+
+@functools.lru_cache(maxsize=1)
+def default_classes():
+    """
+    Returns the default segment classes, built from the resources.
+
+    `V` includes all vowels of the vowel inventories, along with their
+    long counterparts, and `C` all other segments.
+    """
+
+    vowels = set()
+    for entry in abzu.utils.RESOURCES["vowel_inventories"].values():
+        vowels.update(entry["VOWELS"].split("|"))
+    vowels.discard("")
+    vowels.update([vowel + "ː" for vowel in vowels])
+
+    return {"V": (frozenset(vowels), False), "C": (frozenset(vowels), True)}
+
+
+class _Element:
+    """
+    Matcher for a single segment, from a set of segments or its complement.
+    """
+
+    __slots__ = ("segments", "negated")
+
+    def __init__(self, segments, negated=False):
+        self.segments = segments
+        self.negated = negated
+
+    def match(self, segment):
+        if segment == "#":
+            return "#" in self.segments and not self.negated
+
+        return (segment in self.segments) != self.negated
+
+
+class SoundChangeCascade:
+    """
+    Compiled, ordered cascade of context-sensitive sound changes.
+
+    Parameters
+    ----------
+    rules : list of str
+        The rules, in order of application.
+    classes : dict
+        An optional dictionary of class symbols to lists of segments, added
+        to (or overriding) the default classes `V` and `C`.
+    cache_size : int
+        The maximum number of words whose results are memoized, with `None`
+        for no limit. Defaults to 100000.
+    """
+
+    def __init__(self, rules, classes=None, cache_size=100000):
+        self.classes = dict(default_classes())
+        if classes:
+            self.classes.update(
+                {
+                    symbol: (frozenset(segments), False)
+                    for symbol, segments in classes.items()
+                }
+            )
+
+        self.rules = [self._compile(rule) for rule in rules]
+
+        # index the rules by the segments of their sources, as bitmasks of
+        # rule positions; rules with negated sources (such as `C`) can be
+        # triggered by segments not known in advance, and are always tried
+        self._segment_bits = {}
+        self._always = 0
+        for idx, (source, _, _, _) in enumerate(self.rules):
+            if source.negated:
+                self._always |= 1 << idx
+            else:
+                for segment in source.segments:
+                    self._segment_bits[segment] = (
+                        self._segment_bits.get(segment, 0) | 1 << idx
+                    )
+
+        self.cache_size = cache_size
+        self._cached = functools.lru_cache(maxsize=cache_size)(self._apply)
+
+    def __getstate__(self):
+        # the cache cannot be pickled, and is rebuilt when unpickling
+        state = self.__dict__.copy()
+        del state["_cached"]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cached = functools.lru_cache(maxsize=self.cache_size)(
+            self._apply
+        )
+
+    def _element(self, symbol):
+        """
+        Compiles a source or context element into a matcher.
+        """
+
+        if symbol in self.classes:
+            segments, negated = self.classes[symbol]
+            return _Element(segments, negated)
+
+        return _Element(frozenset(symbol.split("|")))
+
+    def _compile(self, rule):
+        """
+        Compiles a rule into source, target map, left and right contexts.
+
+        The target map is a dictionary of source segments to their reflexes,
+        with `None` for deletions, or a single reflex for all segments.
+        """
+
+        try:
+            change, _, context = rule.partition("/")
+            source, target = [part.strip() for part in change.split(">")]
+        except ValueError:
+            raise ValueError("Invalid sound change `%s`" % rule)
+
+        if not source or not target or len(source.split()) != 1:
+            raise ValueError("Invalid sound change `%s`" % rule)
+
+        source_elem = self._element(source)
+        reflexes = [
+            None if reflex in DELETION else reflex
+            for reflex in target.split("|")
+        ]
+        if len(reflexes) == 1:
+            target_map = reflexes[0]
+        elif source not in self.classes and len(reflexes) == len(
+            source.split("|")
+        ):
+            target_map = dict(zip(source.split("|"), reflexes))
+        else:
+            raise ValueError("Invalid sound change target `%s`" % rule)
+
+        left, right = [], []
+        if context.strip():
+            symbols = context.split()
+            if symbols.count("_") != 1:
+                raise ValueError("Invalid sound change context `%s`" % rule)
+            pos = symbols.index("_")
+            left = [self._element(symbol) for symbol in symbols[:pos]]
+            right = [self._element(symbol) for symbol in symbols[pos + 1 :]]
+
+        # left contexts are matched backwards from the source
+        return source_elem, target_map, tuple(left[::-1]), tuple(right)
+
+    @staticmethod
+    def _context(elements, segments, start, step):
+        """
+        Checks if a context matches from a position, in a direction.
+        """
+
+        pos = start
+        for element in elements:
+            segment = segments[pos] if 0 <= pos < len(segments) else None
+            if segment is None:
+                # only a boundary can match beyond the word, and only once
+                if not element.match("#") or pos not in (-1, len(segments)):
+                    return False
+            elif not element.match(segment):
+                return False
+            pos += step
+
+        return True
+
+    def _apply_rule(self, rule, segments):
+        """
+        Applies a rule to all positions of a word, returning the new word or
+        `None` if the rule does not apply.
+        """
+
+        source, target_map, left, right = rule
+
+        changed = False
+        new_segments = []
+        for idx, segment in enumerate(segments):
+            if (
+                source.match(segment)
+                and self._context(left, segments, idx - 1, -1)
+                and self._context(right, segments, idx + 1, 1)
+            ):
+                if isinstance(target_map, dict):
+                    reflex = target_map[segment]
+                else:
+                    reflex = target_map
+                changed = changed or reflex != segment
+                if reflex is not None:
+                    new_segments.append(reflex)
+            else:
+                new_segments.append(segment)
+
+        if not changed:
+            return None
+
+        return tuple(new_segments)
+
+    def _mask(self, segments):
+        """
+        Returns the bitmask of the rules triggered by the segments of a word.
+        """
+
+        mask = self._always
+        for segment in segments:
+            mask |= self._segment_bits.get(segment, 0)
+
+        return mask
+
+    def _apply(self, segments):
+        """
+        Applies the cascade to a tuple of segments.
+        """
+
+        mask = self._mask(segments)
+        while mask:
+            # get the first rule to try, in order
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            mask ^= low
+
+            new_segments = self._apply_rule(self.rules[idx], segments)
+            if new_segments is not None:
+                segments = new_segments
+                mask = self._mask(segments) & ~((low << 1) - 1)
+
+        return segments
+
+    def apply(self, word):
+        """
+        Applies the cascade to a word, memoizing the result.
+
+        Words can be given as tuples of segments, with a tuple returned, or
+        as strings of space-separated segments, with a string returned.
+        """
+
+        if isinstance(word, str):
+            return " ".join(self._cached(tuple(word.split())))
+
+        return self._cached(tuple(word))
+
+    def apply_many(self, words):
+        """
+        Applies the cascade to a list of words.
+
+        Words are given as tuples of segments or strings, as for `apply()`.
+        Each unique word is processed only once, and words that do not
+        change are returned as the very same objects, so that lexicons can
+        share them.
+        """
+
+        results = {}
+        ret = []
+        for word in words:
+            result = results.get(word)
+            if result is None:
+                result = self.apply(word)
+                if result == word:
+                    result = word
+                results[word] = result
+            ret.append(result)
+
+        return ret
+
+    def cache_info(self):
+        """
+        Returns the statistics of the memoization cache.
+        """
+
+        return self._cached.cache_info()
+
+    def cache_clear(self):
+        """
+        Clears the memoization cache.
+        """
+
+        self._cached.cache_clear()
@@ -10,6 +10,10 @@ word ("sequences") in the common sense of comparative linguistics.
 # Import Python standard libraries
 import itertools
 import random
+import re
+
+import abzu.instrument
+import abzu.utils
 
 # Define data for random label generation: sound classes, too complex
 # clusters, and syllable patterns
@@ -31,8 +35,15 @@ __COMPLEX_CLUSTERS = [
 ]
 __PATTERNS = ["V", "CV", "CV", "CVC"]
 
+# Define data for the latinization of species labels: the map of
+# characters to remove ("h", intended as IPA /h/ and not aspiration) or
+# replace ("f" to "ph" and "k" to "c"), and the consonants before vowels
+# which can be aspirated (only "t" and "p") or geminated
+__LATIN_MAP = str.maketrans({"h": None, "f": "ph", "k": "c"})
+__PREVOCALIC = re.compile(r"[bpdtsrlgmn](?=[aeiou])")
+
 
-def __gen_syl(min_syl, max_syl):
+def __gen_syl(min_syl, max_syl, rng=random):
     """
     Internal function for generating a random syllable.
 
@@ -43,6 +54,8 @@ def __gen_syl(min_syl, max_syl):
         The minimum number of syllables.
     max_syl : int
         The maximum number of syllables.
+    rng : random.Random
+        The random number generator to use. Defaults to the global one.
 
     Returns
     -------
@@ -53,11 +66,11 @@ def __gen_syl(min_syl, max_syl):
 
     # Map each syllable to random sounds
     syllables = []
-    for _ in range(random.randint(min_syl, max_syl)):
+    for _ in range(rng.randint(min_syl, max_syl)):
         syllable = "".join(
             [
-                random.choice(__SOUNDS[sound_class])
-                for sound_class in random.choice(__PATTERNS)
+                rng.choice(__SOUNDS[sound_class])
+                for sound_class in rng.choice(__PATTERNS)
             ]
         )
 
@@ -66,7 +79,55 @@ def __gen_syl(min_syl, max_syl):
     return syllables
 
 
-def __clean_label(label):
+def __gen_raw_labels(num_labels, min_syl, max_syl, rng=random):
+    """
+    Internal function for generating random raw labels in batch.
+
+    All random values (number of syllables, syllable patterns, and sounds)
+    are drawn at once for the entire batch, before building the labels.
+
+    Parameters
+    ----------
+
+    num_labels : int
+        The number of labels to generate.
+    min_syl : int
+        The minimum number of syllables.
+    max_syl : int
+        The maximum number of syllables.
+    rng : random.Random
+        The random number generator to use. Defaults to the global one.
+
+    Returns
+    -------
+
+    labels : list of strings
+        A list of raw labels, not cleaned.
+    """
+
+    num_syls = rng.choices(range(min_syl, max_syl + 1), k=num_labels)
+    patterns = rng.choices(__PATTERNS, k=sum(num_syls))
+
+    # Draw all consonants and vowels, and fill the sound classes in order
+    classes = "".join(patterns)
+    sounds = {
+        sound_class: iter(
+            rng.choices(__SOUNDS[sound_class], k=classes.count(sound_class))
+        )
+        for sound_class in __SOUNDS
+    }
+    text = "".join([next(sounds[sound_class]) for sound_class in classes])
+
+    # Split the text at label boundaries, from the lengths of the syllables
+    syl_ends = list(itertools.accumulate([len(pat) for pat in patterns]))
+    label_ends = [syl_ends[end - 1] for end in itertools.accumulate(num_syls)]
+
+    return [
+        text[start:end] for start, end in zip([0] + label_ends, label_ends)
+    ]
+
+
+def __clean_label(label, rng=random):
     """
     Returns a cleaned version of a label.
 
@@ -83,15 +144,16 @@ def __clean_label(label):
     # Remove all "h" next to another consonant (including "h" itself),
     # making sure we only have "h" in intervocalic position or at the
     # beginning of the word (increases readability)
-    label = label.replace("hh", "")
-    for cons in __SOUNDS["C"]:
-        label = label.replace(cons + "h", cons)
-        label = label.replace("h" + cons, cons)
+    if "h" in label:
+        label = label.replace("hh", "")
+        for cons in __SOUNDS["C"]:
+            label = label.replace(cons + "h", cons)
+            label = label.replace("h" + cons, cons)
 
     # Remove too complex clusters by selecting one random sound
     for cluster in __COMPLEX_CLUSTERS:
         if cluster in label:
-            label = label.replace(cluster, cluster[random.randint(0, 1)])
+            label = label.replace(cluster, cluster[rng.randint(0, 1)])
 
     # Remove geminated vowels
     for vowel in __SOUNDS["V"]:
@@ -105,16 +167,28 @@ def __clean_label(label):
     return label.capitalize()
 
 
-def random_labels(size=1, seed=None):
+@abzu.instrument.stage("textgen.random_labels", count=len)
+def random_labels(size=1, seed=None, legacy=False):
     """
     Returns a list of unique random pronounceable labels.
 
+    By default, candidate labels are generated in batch and deduplicated
+    with a set, and only the collisions are extended with new syllables
+    and checked again, so that the cost grows linearly with the number of
+    labels.
+
     Parameters
     ----------
     size : int
         The number of labels in the returned set. Defaults to one.
     seed : value
-        An optional seed for the random number generator. Defaults to None.
+        An optional seed for the random number generator, or a
+        `random.Random` instance to draw from. Defaults to None.
+    legacy : bool
+        Whether to generate labels one at a time, solving each collision
+        before generating the next label, as in version 0.1. Both methods
+        follow the same distribution, but only the legacy one reproduces
+        the seeded output of earlier versions. Defaults to False.
 
     Returns
     -------
@@ -123,25 +197,66 @@ def random_labels(size=1, seed=None):
     """
 
     # Initialize the RNG
-    random.seed(seed)
+    rng = abzu.utils.get_py_rng(seed)
+
+    if legacy:
+        return __random_labels_legacy(size, rng)
+
+    # Generate random capitalized labels with 2 to 3 syllables for all
+    # positions, collecting the unique ones; the positions with collisions
+    # get one more syllable appended, and are checked again in the
+    # following round, until all labels are unique.
+    labels = [None] * size
+    seen = set()
+    pending = list(
+        enumerate(
+            [
+                __clean_label(label, rng)
+                for label in __gen_raw_labels(size, 2, 3, rng)
+            ]
+        )
+    )
+    while pending:
+        collisions = []
+        for idx, label in pending:
+            if label in seen:
+                collisions.append((idx, label))
+            else:
+                seen.add(label)
+                labels[idx] = label
+
+        pending = [
+            (idx, __clean_label(label + __gen_syl(1, 1, rng)[0], rng))
+            for idx, label in collisions
+        ]
+
+    return labels
+
+
+def __random_labels_legacy(size, rng):
+    """
+    Internal function for generating unique labels one at a time.
+    """
 
     # Iterate until enough unique labels have been collected
     ret_labels = []
+    seen = set()
     for _ in range(size):
         # Generate a random capitalized label with 2 to 3 syllables.
-        syllables = __gen_syl(2, 3)
-        label = __clean_label("".join(syllables))
+        syllables = __gen_syl(2, 3, rng)
+        label = __clean_label("".join(syllables), rng)
 
         # Append more syllables if necessary, one at a time, until an unique
         # name is generated.
         while True:
-            if label not in ret_labels:
+            if label not in seen:
                 break
 
-            label = __clean_label(label + __gen_syl(1, 1)[0])
+            label = __clean_label(label + __gen_syl(1, 1, rng)[0], rng)
 
         # Collect the generated label.
         ret_labels.append(label)
+        seen.add(label)
 
     # Return the list of labels
     return ret_labels
@@ -153,7 +268,8 @@ def random_labels(size=1, seed=None):
 # this pseudo-modern Latin, and we only really care about good-enough
 # labels in this case. In other words, please don't care too much about
 # this function or the quality of its code ;)
-def random_species(size=1, seed=None):
+@abzu.instrument.stage("textgen.random_species", count=len)
+def random_species(size=1, seed=None, legacy=False):
     """
     Returns a list of unique random species labels.
 
@@ -162,7 +278,13 @@ def random_species(size=1, seed=None):
     size : int
         The number of labels in the returned set. Defaults to one.
     seed : value
-        An optional seed for the random number generator. Defaults to None.
+        An optional seed for the random number generator, or a
+        `random.Random` instance to draw from. Defaults to None.
+    legacy : bool
+        Whether to generate the labels with the legacy method, applying
+        each change to all labels in turn, reproducing the seeded output
+        of version 0.1. By default, labels are latinized in a single pass
+        each. Defaults to False.
 
     Returns
     -------
@@ -170,11 +292,146 @@ def random_species(size=1, seed=None):
         The list of unique labels.
     """
 
+    rng = abzu.utils.get_py_rng(seed)
+    if legacy:
+        return __random_species_legacy(size, rng)
+
+    # Obtain random labels: we need double the number of items, as
+    # the first half of the list will be the genera, the second the
+    # epithets
+    labels = [label.lower() for label in random_labels(size * 2, rng)]
+
+    return list(__gen_species(labels[:size], labels[size:], rng))
+
+
+def iter_species(seed=None, chunk_size=1000, capacity=10000000):
+    """
+    Yields an endless sequence of unique random species labels.
+
+    Underlying labels are generated in chunks, and each species label is
+    built in a single pass, so that any number of them can be consumed.
+    Labels already yielded are tracked with a Bloom filter of fixed size,
+    so that memory does not grow with the number of labels; beyond its
+    `capacity`, a growing number of new labels is rejected as seen, but no
+    label is ever repeated.
+
+    Parameters
+    ----------
+    seed : value
+        An optional seed for the random number generator, or a
+        `random.Random` instance to draw from. Defaults to None.
+    chunk_size : int
+        The number of species labels built from each chunk of underlying
+        labels. Defaults to 1000.
+    capacity : int
+        The number of labels tracked at the nominal false positive rate of
+        the Bloom filter. Defaults to 10000000.
+    """
+
+    rng = abzu.utils.get_py_rng(seed)
+
+    seen = abzu.utils.BloomFilter(capacity)
+    while True:
+        labels = [label.lower() for label in random_labels(chunk_size * 2, rng)]
+        for species in __gen_species(
+            labels[:chunk_size], labels[chunk_size:], rng
+        ):
+            if species not in seen:
+                seen.add(species)
+                yield species
+
+
+def __gen_species(genera, epithets, rng=random):
+    """
+    Internal function yielding species labels from genera and epithets.
+    """
+
+    for genus, epithet in zip(genera, epithets):
+        yield "%s %s" % (
+            __clean_label(__latinize(genus, rng), rng),
+            __clean_label(__latinize(epithet, rng), rng).lower(),
+        )
+
+
+def __latinize(label, rng=random):
+    """
+    Internal function for turning a lowercase label into pseudo-Latin.
+
+    All changes are applied in a single pass over the label, with a
+    compiled regular expression and a callback for the consonants before
+    vowels, drawing each random decision only once per label and context.
+    """
+
+    # Remove all the "h", replace all "f" with "ph" and "k" with "c"
+    label = label.translate(__LATIN_MAP)
+
+    # If the label does not end in a vowel or in s/r, add a random suffix
+    if label[-1] not in __SOUNDS["V"] + ["s", "r"]:
+        label = label + rng.choice(__SOUNDS["V"]) + rng.choice(["s", ""])
+
+    # Labels ending in "u/e" will end in "us/es", in "i" will end in "is"
+    # 75% of the time (otherwise in "ii"), and in "a" will end in "as"
+    # 50% of the time
+    if label[-1] in "ue":
+        label += "s"
+    elif label[-1] == "i":
+        label += "s" if rng.random() <= 0.75 else "i"
+    elif label[-1] == "a" and rng.random() <= 0.5:
+        label += "s"
+
+    # In case of t/p in front of a vowel, there is a 50% chance that it will
+    # be aspirated; otherwise, intervocalic consonants have a 40% chance of
+    # becoming geminates; decisions are made per context
+    decisions = {}
+
+    def _decide(context, prob):
+        if context not in decisions:
+            decisions[context] = rng.random() < prob
+        return decisions[context]
+
+    def _change(match):
+        cons = match.group()
+        vowel = label[match.end()]
+        if cons in "tp" and _decide((cons, vowel), 0.5):
+            return cons + "h"
+
+        prev = label[match.start() - 1] if match.start() else ""
+        if prev in __SOUNDS["V"] and _decide((prev, cons, vowel), 0.4):
+            return cons + cons
+
+        return cons
+
+    label = __PREVOCALIC.sub(_change, label)
+
+    # In case the label starts with a labial plosive, it will gain an "s"
+    # in front
+    if label[0] in "pb":
+        label = "s" + label
+
+    # If the label is short, add a random suffix
+    if len(label) < 5:
+        label = "%s%s%s" % (
+            label,
+            rng.choice(["r", "r", "l"]),
+            rng.choice(__SOUNDS["V"]) + "s",
+        )
+
+    return label
+
+
+def __random_species_legacy(size, rng):
+    """
+    Internal function for generating species labels as in version 0.1.
+
+    Each change is applied to the entire list of labels before the next
+    one, which is slower but reproduces the earlier seeded output.
+    """
+
     # Obtain random labels: we need double the number of items, as
     # the first half of the list will be the genera,
     # the second the epithets (they will be combined later, with
     # capitalization, etc.)
-    labels = [label.lower() for label in random_labels(size * 2, seed)]
+    labels = [label.lower() for label in random_labels(size * 2, rng, True)]
 
     # Remove all the "h" in the original labels, as they are intended to be
     # IPA /h/ and not aspiration
@@ -186,7 +443,7 @@ def random_species(size=1, seed=None):
 
     # If the label does not end in a vowel or in s/r, add a random suffix
     labels = [
-        label + random.choice(__SOUNDS["V"]) + random.choice(["s", ""])
+        label + rng.choice(__SOUNDS["V"]) + rng.choice(["s", ""])
         if label[-1] not in __SOUNDS["V"] + ["s", "r"]
         else label
         for label in labels
@@ -202,7 +459,7 @@ def random_species(size=1, seed=None):
     # in "ii"
     labels = [
         label + "s"
-        if (label.endswith("i") and random.random() <= 0.75)
+        if (label.endswith("i") and rng.random() <= 0.75)
         else label
         for label in labels
     ]
@@ -211,7 +468,7 @@ def random_species(size=1, seed=None):
     # If a label ends in "a", it will end in "as" 50% of the time
     labels = [
         label + "s"
-        if (label.endswith("a") and random.random() <= 0.5)
+        if (label.endswith("a") and rng.random() <= 0.5)
         else label
         for label in labels
     ]
@@ -224,7 +481,7 @@ def random_species(size=1, seed=None):
         for vowel in __SOUNDS["V"]:
             labels = [
                 label.replace(plosive + vowel, plosive + "h" + vowel)
-                if random.random() <= 0.5
+                if rng.random() <= 0.5
                 else label
                 for label in labels
             ]
@@ -247,7 +504,7 @@ def random_species(size=1, seed=None):
 
                 labels = [
                     label.replace(source, target)
-                    if random.random() < 0.4
+                    if rng.random() < 0.4
                     else label
                     for label in labels
                 ]
@@ -257,8 +514,8 @@ def random_species(size=1, seed=None):
         "%s%s%s"
         % (
             label,
-            random.choice(["r", "r", "l"]),
-            random.choice(__SOUNDS["V"]) + "s",
+            rng.choice(["r", "r", "l"]),
+            rng.choice(__SOUNDS["V"]) + "s",
         )
         if len(label) < 5
         else label
@@ -267,7 +524,8 @@ def random_species(size=1, seed=None):
 
     # Build the actual labels from genera and epithets and return
     labels = [
-        "%s %s" % (__clean_label(genus), __clean_label(epithet).lower())
+        "%s %s"
+        % (__clean_label(genus, rng), __clean_label(epithet, rng).lower())
         for genus, epithet in itertools.zip_longest(
             labels[:size], labels[size:]
         )
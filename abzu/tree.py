@@ -1,16 +1,314 @@
+import collections
+import math
+import os
 import random
+
 import numpy as np
 
 import abzu
 import ngesh
 
 
+def random_sound_changes(inventory, dist, param, rng):
+    """
+    Returns a random set of regular sound changes for a branch.
+
+    The number of changes is drawn from a Poisson distribution whose mean
+    is proportional to the branch length. Each change is unconditional and
+    either merges a segment with another one in the inventory or, with a
+    smaller probability, deletes it; changes are composed into a single
+    mapping from segments to their reflexes, with `None` for deletions.
+
+    Parameters
+    ----------
+    inventory : list of str
+        The sorted list of segments found in the lexicon.
+    dist : float
+        The length of the branch.
+    param : dict
+        A dictionary of parameters; missing ones are set to their default
+        values.
+    rng : numpy.random.Generator
+        The random number generator to use.
+
+    Returns
+    -------
+    changes : dict
+        The mapping of segments to their reflexes, including only the
+        segments that change.
+    """
+
+    rate = param.get("sound_change_rate", 2.0)
+    loss = param.get("sound_loss", 0.1)
+
+    changes = {}
+    if len(inventory) < 2:
+        return changes
+
+    for _ in range(rng.poisson(rate * dist)):
+        source = inventory[rng.choice(len(inventory))]
+        if rng.random() < loss:
+            target = None
+        else:
+            target = inventory[rng.choice(len(inventory) - 1)]
+            if target == source:
+                target = inventory[-1]
+
+        # compose with the previous changes, so that the mapping is applied
+        # in a single pass over each word
+        for segment, reflex in changes.items():
+            if reflex == source:
+                changes[segment] = target
+        changes.setdefault(source, target)
+
+    return {
+        segment: reflex
+        for segment, reflex in changes.items()
+        if segment != reflex
+    }
+
+
+def apply_sound_changes(lexicon, changes):
+    """
+    Applies a mapping of sound changes to a lexicon, copying on write.
+
+    Words not affected by the changes are shared with the original lexicon,
+    and the lexicon itself is returned unchanged if no word is affected.
+    Changed words go through the basic phonotactics, and changes that would
+    leave a word empty are not applied to it.
+    """
+
+    if not changes:
+        return lexicon
+
+    new_lexicon = []
+    modified = False
+    for word in lexicon:
+        if any(segment in changes for segment in word):
+            new_word = tuple(
+                changes.get(segment, segment)
+                for segment in word
+                if changes.get(segment, segment) is not None
+            )
+            if new_word:
+                word = abzu.kiss.BASIC_PHONOTACTICS.rewrite(new_word)
+                modified = True
+
+        new_lexicon.append(word)
+
+    if not modified:
+        return lexicon
+
+    return tuple(new_lexicon)
+
+
+# Lightweight, picklable node for sending clades to worker processes
+_Node = collections.namedtuple("_Node", ["name", "dist", "children"])
+
+
+def _clade(node):
+    """
+    Returns a copy of a subtree built from `_Node`s.
+
+    ete3 nodes keep references to their parents, so that pickling one of
+    them would send the entire tree to the workers.
+    """
+
+    # build the copies in postorder, with an explicit stack
+    copies = {}
+    stack = [(node, False)]
+    while stack:
+        current, visited = stack.pop()
+        if visited or not current.children:
+            copies[id(current)] = _Node(
+                current.name,
+                current.dist,
+                tuple(copies.pop(id(child)) for child in current.children),
+            )
+        else:
+            stack.append((current, True))
+            stack.extend((child, False) for child in current.children)
+
+    return copies[id(node)]
+
+
+def _node_rng(entropy, path):
+    """
+    Returns the random number generator of the node at a path.
+
+    The path is the sequence of child indices from the root, so that the
+    stream of each node depends only on the master seed and on its position
+    in the tree, and not on the order in which nodes are simulated.
+    """
+
+    return np.random.default_rng(
+        np.random.SeedSequence(entropy, spawn_key=path)
+    )
+
+
+def _walk(node, lexicon, path, entropy, param, max_depth=None):
+    """
+    Evolves a lexicon from a node in preorder, yielding the nodes reached.
+
+    Yields triples of node, path, and lexicon for all leaves and, if
+    `max_depth` is given, for the internal nodes at that depth below the
+    starting one, which are not descended into.
+    """
+
+    if max_depth is not None:
+        max_depth += len(path)
+
+    stack = [(node, path, lexicon)]
+    while stack:
+        node, path, lexicon = stack.pop()
+        if not node.children or len(path) == max_depth:
+            yield node, path, lexicon
+            continue
+
+        inventory = sorted({segment for word in lexicon for segment in word})
+
+        # children are pushed in reverse, so that they are popped in order
+        for idx in reversed(range(len(node.children))):
+            child = node.children[idx]
+            child_path = path + (idx,)
+            rng = _node_rng(entropy, child_path)
+            changes = random_sound_changes(inventory, child.dist, param, rng)
+            stack.append(
+                (child, child_path, apply_sound_changes(lexicon, changes))
+            )
+
+
+def _evolve_clade(task):
+    """
+    Evolves the lexicon of a clade, in a worker process.
+    """
+
+    clade, lexicon, path, entropy, param = task
+
+    return [
+        (leaf.name, leaf_lexicon)
+        for leaf, _, leaf_lexicon in _walk(
+            clade, lexicon, path, entropy, param
+        )
+    ]
+
+
+def evolve_lexicon(
+    tree, lexicon, param=None, seed=None, workers=1, split_depth=None
+):
+    """
+    Evolves a lexicon along a tree, yielding the lexicons of the leaves.
+
+    The tree is walked once in preorder, with an explicit stack, and the
+    lexicon of each node is obtained by applying random sound changes,
+    scaled by the branch length, to the lexicon of its parent. Unchanged
+    words (and lexicons) are shared between parent and child, and each
+    internal lexicon is only referenced by the stack entries of its
+    pending children, so that it is released as soon as the last of them
+    is processed and memory is bounded by the depth of the tree.
+
+    The changes of each branch are drawn from a random number generator
+    seeded from the master seed and the path of the node from the root, so
+    that the clades below `split_depth` can be simulated independently in
+    a process pool, with results identical to those of a serial run.
+
+    Parameters
+    ----------
+    tree : ete3.Tree
+        The tree, such as the ones generated by `ngesh`; any object with
+        `name`, `dist`, and `children` attributes can be used as a node.
+    lexicon : list
+        The lexicon at the root, as a list of words, each either a tuple of
+        segments or a string of space-separated segments.
+    param : dict
+        An optional dictionary of parameters. Defaults to None.
+    seed : value
+        An optional seed for the random number generators, or a
+        `numpy.random.Generator` to draw the master seed from. Defaults to
+        None.
+    workers : int
+        The number of worker processes, with `None` for all available CPUs.
+        Defaults to one, simulating the entire tree in the current process.
+    split_depth : int
+        The depth at which the tree is split in clades for the workers.
+        Defaults to None, using enough levels for about four clades per
+        worker in a binary tree.
+
+    Returns
+    -------
+    leaves : generator of tuples
+        Pairs of leaf name and lexicon, as a tuple of tuples of segments,
+        in preorder.
+    """
+
+    if not param:
+        param = {}
+
+    if isinstance(seed, np.random.Generator):
+        entropy = int(seed.integers(2**63))
+    else:
+        entropy = abzu.utils.seed_sequence(seed).entropy
+
+    lexicon = tuple(
+        tuple(word.split()) if isinstance(word, str) else tuple(word)
+        for word in lexicon
+    )
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    # the root keeps the original lexicon
+    if workers == 1:
+        for leaf, _, leaf_lexicon in _walk(tree, lexicon, (), entropy, param):
+            yield leaf.name, leaf_lexicon
+        return
+
+    if split_depth is None:
+        split_depth = math.ceil(math.log2(4 * workers))
+
+    # the top of the tree is simulated here, and the clades below the split
+    # (generated lazily, in preorder) by the workers
+    tasks = (
+        (_clade(node), node_lexicon, path, entropy, param)
+        for node, path, node_lexicon in _walk(
+            tree, lexicon, (), entropy, param, split_depth
+        )
+    )
+    for leaves in abzu.utils.parallel_map(_evolve_clade, tasks, workers):
+        yield from leaves
+
+
 def tree_test():
     CONCEPTS = 10
 
     # generate a fixed tree for the tests
     tree = ngesh.gen_tree(1.0, 0.5, max_time=1.0, labels="human", seed=13)
 
+    # generate the lexicon of the root and evolve it along the tree
+    phonology = abzu.kiss.Phonology.random({}, seed=13)
+    words = phonology.sample(CONCEPTS)
+    leaves = evolve_lexicon(tree, words, seed=13)
+
+    print(tree)
+
+    rows = (
+        {
+            "LANGUAGE": taxon,
+            "CONCEPT": "concept-%i" % (idx + 1),
+            "FORM": " ".join(word),
+        }
+        for taxon, lexicon in leaves
+        for idx, word in enumerate(lexicon)
+    )
+    abzu.writers.write_wordlist(rows, fmt="cldf")
+
+
+def cognate_test():
+    CONCEPTS = 10
+
+    # generate a fixed tree for the tests
+    tree = ngesh.gen_tree(1.0, 0.5, max_time=1.0, labels="human", seed=13)
+
     # TODO: need to add seed to `add_characters`
     # TODO: need to sort the taxa in output in `tree2nexus`
     tree = ngesh.add_characters(tree, CONCEPTS, 3.0, 0.5, seed=13)
@@ -31,14 +329,10 @@ def tree_test():
     print(data)
     print(words, len(words))
 
-    for node in tree.iter_descendants():
-        print([node.name], node.dist)
-        print(dir(node))
+    output_wordlist(data, words)
 
-    # output_wordlist(data, words)
 
-
-def output_wordlist(data, words):
+def output_wordlist(data, words, filename=None, fmt="cldf"):
     # attribute
     # TODO: copying directly here, needs sound changes, HTG, etc.
     wordlist = {
@@ -47,20 +341,19 @@ def output_wordlist(data, words):
 
     CONCEPTS = len(list(data.values())[0])
 
-    # wordlist output
-    row_id = 1
-    for taxon in sorted(wordlist):
-        for i in range(CONCEPTS):
-            buf = [
-                str(row_id),
-                taxon,
-                "concept-%i" % (i + 1),
-                wordlist[taxon][i],
-                str(data[taxon][i] + 1),  # cogid
-            ]
-            print(",".join(buf))
-
-            row_id += 1
+    # wordlist output, streamed from a generator
+    rows = (
+        {
+            "LANGUAGE": taxon,
+            "CONCEPT": "concept-%i" % (i + 1),
+            "FORM": wordlist[taxon][i],
+            "COGID": data[taxon][i] + 1,
+        }
+        for taxon in sorted(wordlist)
+        for i in range(CONCEPTS)
+    )
+
+    abzu.writers.write_wordlist(rows, filename, fmt)
 
 
 if __name__ == "__main__":
@@ -1,23 +1,43 @@
 # Import Python standard libraries
+import collections
+import csv
+from hashlib import blake2b, sha256
+import itertools
+import math
+import os
+from os import path
+import pickle
 import random
-from hashlib import sha256
+import threading
 
 # Import 3rd party libraries
 import numpy as np
 
+# Set the resource directory; this is safe as we already added
+# `zip_safe=False` to setup.py
+RESOURCE_DIR = path.join(path.dirname(path.dirname(__file__)), "resources")
+
+# Version of the resource snapshots, to be increased whenever the structure
+# of the loaded or built resources changes
+SNAPSHOT_VERSION = 1
+
 # TODO: check for other types, lists, etc.
 # TODO: decide what to do when seed is None
 # TODO: check if there are faster ways to get the buffer
 # TODO: make sure the python random seed is correct every time
 def seed_rngs(seed=None):
     """
-    Sets a seed to both Python and numpy's RNGs.
+    Sets a seed to both Python and numpy's global RNGs.
 
     The main purpose of this function is to guarantee reproducibility when
     mixing Python and numpy's RNGs, also allowing to use strings as seed
     (numpy only takes uint32 of arrays of uint32 as seed). This is done
     by converting non-integer seeds to a numpy array from a buffer
     build from a hash.
+
+    As it changes the global state, the function is kept for compatibility
+    with string and integer seeds; explicit generators, as returned by
+    `get_rng()` and `spawn_rngs()`, should be preferred for concurrent use.
     """
 
     # Seed the Python RNGs
@@ -28,9 +48,351 @@ def seed_rngs(seed=None):
         return
     elif isinstance(seed, str):
         _seed = np.frombuffer(
-        sha256(seed.encode("utf-8")).digest(), dtype=np.uint32
+            sha256(seed.encode("utf-8")).digest(), dtype=np.uint32
         )
     else:
         _seed = seed
 
     np.random.seed(_seed)
+
+
+def get_rng(seed=None):
+    """
+    Returns the numpy random number generator to use for a seed.
+
+    Instances of `numpy.random.Generator` are returned unchanged, so that
+    independent streams can be passed down to all functions without
+    touching the global state, allowing concurrent and reproducible use.
+    Any other value is handled as a compatibility wrapper: a seed that is
+    not `None` is set to the global RNGs with `seed_rngs()`, and the
+    `numpy.random` module, which offers the same sampling methods, is
+    returned. Passing the module itself continues with the global state.
+    """
+
+    if isinstance(seed, np.random.Generator) or seed is np.random:
+        return seed
+
+    if seed is not None:
+        seed_rngs(seed)
+
+    return np.random
+
+
+def get_py_rng(seed=None):
+    """
+    Returns the Python random number generator to use for a seed.
+
+    Instances of `random.Random` (and the `random` module itself) are
+    returned unchanged, while numpy Generators are used to seed a new
+    `random.Random` instance, and the `numpy.random` module maps to the
+    `random` module. Any other value is set as the seed of the
+    global Python RNG, as done by `random.seed()`, and the `random` module
+    is returned.
+    """
+
+    if isinstance(seed, random.Random) or seed is random:
+        return seed
+
+    # the global numpy state goes with the global Python one, both seeded
+    # by `seed_rngs()`
+    if seed is np.random:
+        return random
+
+    if isinstance(seed, np.random.Generator):
+        return random.Random(int(seed.integers(2 ** 63)))
+
+    random.seed(seed)
+
+    return random
+
+
+def seed_sequence(seed=None):
+    """
+    Returns a `numpy.random.SeedSequence` for a seed.
+
+    String seeds are converted to integers from their sha256 hash; `None`
+    draws fresh entropy from the operating system.
+    """
+
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+
+    if isinstance(seed, str):
+        seed = int.from_bytes(sha256(seed.encode("utf-8")).digest(), "little")
+
+    return np.random.SeedSequence(seed)
+
+
+def spawn_rngs(seed, num):
+    """
+    Returns a list of independent numpy Generators spawned from a seed.
+
+    The child streams are derived with `SeedSequence.spawn()`, so that
+    they do not overlap and depend only on the seed and on their position
+    in the list, making them adequate for parallel workers.
+    """
+
+    children = seed_sequence(seed).spawn(num)
+
+    return [np.random.default_rng(child) for child in children]
+
+
+def _map_chunk(func, chunk):
+    """
+    Applies a function to a chunk of items, in a worker process.
+    """
+
+    return [func(item) for item in chunk]
+
+
+def parallel_map(func, iterable, workers=1, chunksize=1):
+    """
+    Applies a function to all items of an iterable, yielding results in order.
+
+    With more than one worker, the items are distributed in chunks to a
+    process pool; only a bounded number of chunks is kept pending at any
+    time, so that results are streamed back in order and with constant
+    memory regardless of the number of items. The function must be
+    picklable, i.e., defined at the top level of a module.
+
+    Parameters
+    ----------
+    func : callable
+        The function to apply to each item.
+    iterable : iterable
+        The items to process.
+    workers : int
+        The number of worker processes; a value of one (the default)
+        processes all items in the current process, and `None` uses all
+        available CPUs.
+    chunksize : int
+        The number of items sent to a worker at once. Defaults to one.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        yield from map(func, iterable)
+        return
+
+    # imported here, as `multiprocessing` adds noticeably to the import time
+    # of the package
+    from concurrent.futures import ProcessPoolExecutor
+
+    items = iter(iterable)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        while True:
+            # keep all workers busy, with another chunk waiting for each
+            while len(pending) < 2 * workers:
+                chunk = list(itertools.islice(items, chunksize))
+                if not chunk:
+                    break
+                pending.append(executor.submit(_map_chunk, func, chunk))
+
+            if not pending:
+                break
+
+            yield from pending.popleft().result()
+
+
+class BloomFilter:
+    """
+    Probabilistic set of strings, with a fixed memory footprint.
+
+    Membership tests have no false negatives, and false positives at about
+    `error_rate` once `capacity` strings have been added. Strings are
+    hashed with `blake2b`, so that results do not depend on the hash
+    randomization of the interpreter and seeded runs are reproducible.
+
+    Parameters
+    ----------
+    capacity : int
+        The expected number of strings to add.
+    error_rate : float
+        The false positive rate at capacity. Defaults to 0.001.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = int(
+            math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.num_hashes = max(
+            int(round(self.size / capacity * math.log(2))), 1
+        )
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, item):
+        """
+        Returns the bit positions of a string, by double hashing.
+        """
+
+        digest = blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+
+        return [(h1 + idx * h2) % self.size for idx in range(self.num_hashes)]
+
+    def __contains__(self, item):
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+    def add(self, item):
+        """
+        Adds a string to the filter.
+        """
+
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+
+def read_data(filename):
+    """
+    Reads a tab-separated resource file into a dictionary keyed by `ID`.
+    """
+
+    filename = path.join(RESOURCE_DIR, filename)
+
+    with open(filename, encoding="utf-8") as csvfile:
+        data = {
+            row.pop("ID"): row
+            for row in csv.DictReader(csvfile, delimiter="\t")
+        }
+
+    return data
+
+
+def default_cache_dir():
+    """
+    Returns the default directory for resource snapshots.
+
+    The directory can be set with the `ABZU_CACHE_DIR` environment variable,
+    where an empty value disables snapshots; otherwise, an `abzu`
+    subdirectory of `XDG_CACHE_HOME` (or of `~/.cache`) is used.
+    """
+
+    cache_dir = os.environ.get("ABZU_CACHE_DIR")
+    if cache_dir is not None:
+        return cache_dir or None
+
+    base_dir = os.environ.get("XDG_CACHE_HOME") or path.join(
+        path.expanduser("~"), ".cache"
+    )
+
+    return path.join(base_dir, "abzu")
+
+
+class ResourceRegistry:
+    """
+    Registry of resources loaded lazily, on first access.
+
+    Each resource is built from a file in the resource directory, by default
+    with `read_data()`. Built resources are kept in memory and stored as
+    pickled snapshots in a cache directory, keyed by a hash of the source
+    file, so that later processes can skip parsing the files as long as
+    they have not changed. Snapshots are a best-effort cache: failures to
+    read or write them only fall back to building the resource.
+    """
+
+    def __init__(self, resource_dir=RESOURCE_DIR, cache_dir=None):
+        self.resource_dir = resource_dir
+        self.cache_dir = cache_dir
+        self._sources = {}
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, filename, build=read_data):
+        """
+        Registers a resource, to be built by calling `build(filename)`.
+
+        Resources built from more than one file take a tuple of filenames,
+        which are all passed to `build()` and all checked for changes.
+        """
+
+        self._sources[name] = (filename, build)
+        self._data.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._sources
+
+    def __getitem__(self, name):
+        # Fast path, without locking, for resources already loaded
+        try:
+            return self._data[name]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if name not in self._data:
+                self._data[name] = self._load(name)
+
+        return self._data[name]
+
+    def _snapshot_path(self, name, filenames):
+        """
+        Returns the path of the snapshot for the current contents of files.
+        """
+
+        digest = sha256()
+        digest.update(("%s:%i:" % (name, SNAPSHOT_VERSION)).encode("utf-8"))
+        for filename in filenames:
+            with open(path.join(self.resource_dir, filename), "rb") as handler:
+                digest.update(handler.read())
+
+        return path.join(
+            self.cache_dir, "%s-%s.pickle" % (name, digest.hexdigest()[:16])
+        )
+
+    def _load(self, name):
+        """
+        Loads a resource from its snapshot, building it if necessary.
+        """
+
+        filenames, build = self._sources[name]
+        if not isinstance(filenames, tuple):
+            filenames = (filenames,)
+
+        if not self.cache_dir:
+            return build(*filenames)
+
+        snapshot = self._snapshot_path(name, filenames)
+        try:
+            with open(snapshot, "rb") as handler:
+                return pickle.load(handler)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass
+
+        data = build(*filenames)
+
+        # Write to a temporary file and rename, so that concurrent processes
+        # never read a partial snapshot
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_file = "%s.%i.tmp" % (snapshot, os.getpid())
+            with open(tmp_file, "wb") as handler:
+                pickle.dump(data, handler, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, snapshot)
+        except OSError:
+            pass
+
+        return data
+
+    def clear(self):
+        """
+        Removes all loaded resources from memory.
+        """
+
+        with self._lock:
+            self._data.clear()
+
+
+# The default registry of resources, shared by all modules
+RESOURCES = ResourceRegistry(cache_dir=default_cache_dir())
+RESOURCES.register("vowel_inventories", "vowel_inventories.tsv")
+RESOURCES.register("syllable_patterns", "syllable_patterns.tsv")
+RESOURCES.register("consonant_inventories", "consonant_inventories.tsv")
+RESOURCES.register("phoneme_frequency", "phoneme_frequency.tsv")
@@ -0,0 +1,258 @@
+# encoding: utf-8
+
+"""
+Module with streaming writers for wordlists.
+
+Writers pull rows from any iterable (usually a generator), formatting and
+writing them in batches, so that large wordlists can be written in
+constant memory and without the overhead of one write per line. Output
+can be directed to the standard output or to files, optionally compressed
+with gzip.
+"""
+
+# Import Python standard libraries
+import contextlib
+import csv
+import gzip
+import io
+import json
+import sys
+
+# The default fields of wordlist rows, following the naming of the
+# resource files
+WORDLIST_FIELDS = ["ID", "LANGUAGE", "CONCEPT", "FORM", "COGID"]
+
+
+@contextlib.contextmanager
+def open_output(filename=None, compress=None):
+    """
+    Opens a text stream for writing, closing it at the end if necessary.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the output file; if `None` or `"-"`, the standard
+        output is used. Defaults to `None`.
+    compress : bool
+        Whether to compress the output with gzip. Defaults to `None`,
+        compressing only if the filename ends in `.gz`.
+    """
+
+    to_stdout = not filename or filename == "-"
+    if compress is None:
+        compress = not to_stdout and filename.endswith(".gz")
+
+    if to_stdout and not compress:
+        yield sys.stdout
+        sys.stdout.flush()
+    elif to_stdout:
+        with gzip.open(sys.stdout.buffer, "wt", encoding="utf-8") as stream:
+            yield stream
+    elif compress:
+        with gzip.open(filename, "wt", encoding="utf-8", newline="") as stream:
+            yield stream
+    else:
+        with open(filename, "w", encoding="utf-8", newline="") as stream:
+            yield stream
+
+
+class WordlistWriter:
+    """
+    Base class for streaming wordlist writers.
+
+    Rows are dictionaries keyed by field name, with missing fields left
+    empty; rows without an `ID` are numbered sequentially. Subclasses only
+    need to implement `format_rows()`, and `format_header()` if the format
+    has a header.
+    """
+
+    def __init__(self, stream, fields=None, batch_size=1000):
+        self.stream = stream
+        self.fields = fields or WORDLIST_FIELDS
+        self.batch_size = batch_size
+        self.num_rows = 0
+
+    def format_header(self):
+        """
+        Returns the header of the output, or `None` if there is none.
+        """
+
+        return None
+
+    def format_rows(self, rows):
+        """
+        Returns the text for a batch of rows.
+        """
+
+        raise NotImplementedError
+
+    def _fill(self, row):
+        """
+        Returns the values of a row for all fields, numbering it if needed.
+        """
+
+        self.num_rows += 1
+        values = [row.get(field, "") for field in self.fields]
+        if "ID" in self.fields and not row.get("ID"):
+            values[self.fields.index("ID")] = self.num_rows
+
+        return values
+
+    def write(self, rows):
+        """
+        Writes all rows from an iterable, returning the number of rows.
+        """
+
+        header = self.format_header()
+        if header is not None and not self.num_rows:
+            self.stream.write(header)
+
+        start = self.num_rows
+        batch = []
+        for row in rows:
+            batch.append(self._fill(row))
+            if len(batch) == self.batch_size:
+                self.stream.write(self.format_rows(batch))
+                batch = []
+
+        if batch:
+            self.stream.write(self.format_rows(batch))
+
+        return self.num_rows - start
+
+
+class TSVWriter(WordlistWriter):
+    """
+    Writer for tab-separated values, with a header.
+    """
+
+    def format_header(self):
+        return "\t".join(self.fields) + "\n"
+
+    def format_rows(self, rows):
+        return "".join(
+            ["\t".join([str(value) for value in row]) + "\n" for row in rows]
+        )
+
+
+class JSONLinesWriter(WordlistWriter):
+    """
+    Writer for JSON Lines, with one object per row.
+    """
+
+    def format_rows(self, rows):
+        return "".join(
+            [
+                json.dumps(dict(zip(self.fields, row)), ensure_ascii=False)
+                + "\n"
+                for row in rows
+            ]
+        )
+
+
+class CLDFWriter(WordlistWriter):
+    """
+    Writer for CLDF-style wordlists, as the CSV of a `FormTable`.
+
+    Fields are mapped to the CLDF column names, and the space-separated
+    forms are given both as unsegmented `Form` and as `Segments`.
+    """
+
+    COLUMNS = {
+        "ID": "ID",
+        "LANGUAGE": "Language_ID",
+        "CONCEPT": "Parameter_ID",
+        "FORM": "Form",
+        "COGID": "Cognateset_ID",
+    }
+
+    def _columns(self):
+        columns = [self.COLUMNS.get(field, field) for field in self.fields]
+        if "FORM" in self.fields:
+            columns.insert(self.fields.index("FORM") + 1, "Segments")
+
+        return columns
+
+    def _csv(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(rows)
+
+        return buffer.getvalue()
+
+    def format_header(self):
+        return self._csv([self._columns()])
+
+    def format_rows(self, rows):
+        if "FORM" in self.fields:
+            idx = self.fields.index("FORM")
+            rows = [
+                row[:idx]
+                + [row[idx].replace(" ", ""), row[idx]]
+                + row[idx + 1 :]
+                for row in rows
+            ]
+
+        return self._csv(rows)
+
+
+# Map of format names to writer classes
+WRITERS = {"tsv": TSVWriter, "jsonl": JSONLinesWriter, "cldf": CLDFWriter}
+
+
+def wordlist_rows(languages):
+    """
+    Yields the wordlist rows for an iterable of languages.
+
+    Languages can be given as `Language` objects, whose concepts are gloss
+    IDs, or as pairs of name and either a dictionary of concepts to words
+    or a list of words.
+    """
+
+    for lang in languages:
+        if isinstance(lang, tuple):
+            name, vocab = lang
+            if isinstance(vocab, dict):
+                vocab = vocab.items()
+            else:
+                vocab = (
+                    ("concept-%i" % (idx + 1), word)
+                    for idx, word in enumerate(vocab)
+                )
+        else:
+            name, vocab = lang.name, lang.items()
+
+        for concept, word in vocab:
+            yield {"LANGUAGE": name, "CONCEPT": concept, "FORM": word}
+
+
+def write_wordlist(rows, filename=None, fmt="tsv", compress=None, fields=None):
+    """
+    Writes wordlist rows in one of the supported formats.
+
+    Parameters
+    ----------
+    rows : iterable of dict
+        The rows to write, usually from a generator.
+    filename : str
+        The path of the output file, with `None` or `"-"` for the standard
+        output. Defaults to `None`.
+    fmt : str
+        The output format, one of `"tsv"`, `"jsonl"`, or `"cldf"`. Defaults
+        to `"tsv"`.
+    compress : bool
+        Whether to compress the output with gzip. Defaults to `None`,
+        compressing only if the filename ends in `.gz`.
+    fields : list of str
+        The fields to write. Defaults to `WORDLIST_FIELDS`.
+
+    Returns
+    -------
+    num_rows : int
+        The number of rows written.
+    """
+
+    if fmt not in WRITERS:
+        raise ValueError("Unknown output format `%s`" % fmt)
+
+    with open_output(filename, compress) as stream:
+        return WRITERS[fmt](stream, fields).write(rows)